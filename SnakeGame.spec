@@ -10,7 +10,7 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=['numpy'],  # 游戏不用 numpy，避免单文件包变大、启动解压变慢
     noarchive=False,
     optimize=0,
 )
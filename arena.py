@@ -0,0 +1,579 @@
+import argparse
+import asyncio
+import multiprocessing
+import random
+import struct
+import sys
+import time
+import zlib
+
+from profiler import FrameProfiler
+from snake_core import (
+    DIRECTIONS, DENSE_BOARD_LIMIT, CELL_EMPTY, CELL_SNAKE, CELL_OBSTACLE, CELL_FOOD,
+    Obstacle, Snake, TickClock, make_board
+)
+
+# 多人竞技场：服务器是唯一的权威，按固定节拍在同一个棋盘上推进所有玩家的蛇
+#
+# 每个连接有自己的读任务，收到的方向直接进入该玩家蛇的输入队列，节拍循环从不等待网络；
+# 每帧只广播变化（移动、让出的蛇尾、死亡、出生、分数、食物增减），编码一次后原样写给所有连接。
+# 消息都是 4 字节小端长度加内容，内容首字节为类型：
+#
+#   SNAPSHOT  加入时发送一次：逻辑帧、棋盘宽高、自己的编号、节拍，障碍物、食物和每条蛇的完整状态
+#   DELTA     每帧一条：逻辑帧、各类变化的个数、棋盘占用表的 CRC32，之后依次为各类变化
+#   INPUT     客户端发送：方向编号
+#
+# 移动只发 (编号, 方向编号)，客户端由上一帧的蛇头算出新蛇头；CRC32 用来发现客户端镜像是否走偏。
+
+ARENA_WIDTH = 160
+ARENA_HEIGHT = 120
+ARENA_RATE = 15  # 每秒逻辑帧数
+ARENA_OBSTACLES = 60
+MIN_FOOD = 20  # 场上至少保持的食物数，此外每两名玩家再加一个
+RESPAWN_TICKS = 30  # 死亡后多少逻辑帧重生
+MAX_PENDING_BYTES = 1 << 20  # 写缓冲积压超过这么多字节的客户端被断开，慢客户端不能拖住节拍
+MAX_MESSAGE = 1 << 26
+MAX_INPUT_MESSAGE = 16
+
+MSG_SNAPSHOT = 1
+MSG_DELTA = 2
+MSG_INPUT = 3
+
+LENGTH = struct.Struct('<I')
+SNAPSHOT_HEADER = struct.Struct('<BIHHHBIII')  # 类型、逻辑帧、宽、高、自己的编号、节拍、障碍物数、食物数、蛇数
+SNAKE_HEADER = struct.Struct('<HHBI')  # 编号、分数、方向编号、蛇身长度
+DELTA_HEADER = struct.Struct('<BIHHHHHHHI')  # 类型、逻辑帧、移动、蛇尾、死亡、出生、分数、食物减、食物增、CRC32
+SPAWN = struct.Struct('<HIB')  # 编号、格子、方向编号
+SCORE = struct.Struct('<HH')  # 编号、新分数
+INPUT = struct.Struct('<BB')
+
+
+class ProtocolError(ValueError):
+    """ 收到的消息格式错误 """
+
+
+def frame(payload):
+    return LENGTH.pack(len(payload)) + payload
+
+
+async def close_writer(writer):
+    """ 关闭连接并等到底层传输真正关闭；对方已断开时忽略错误 """
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except (ConnectionError, OSError):
+        pass
+
+
+async def read_message(reader, limit=MAX_MESSAGE):
+    size, = LENGTH.unpack(await reader.readexactly(LENGTH.size))
+    if size == 0 or size > limit:
+        raise ProtocolError(f'消息长度无效: {size}')
+    return await reader.readexactly(size)
+
+
+def _pack_cells(cells):
+    return struct.pack(f'<{len(cells)}I', *cells)
+
+
+def _unpack(fmt, count, data, pos):
+    size = struct.calcsize(f'<{count}{fmt}')
+    if pos + size > len(data):
+        raise ProtocolError('消息被截断')
+    return struct.unpack_from(f'<{count}{fmt}', data, pos), pos + size
+
+
+class ArenaPlayer:
+    __slots__ = ('id', 'snake', 'respawn_tick', 'deaths')
+
+    def __init__(self, player_id, respawn_tick):
+        self.id = player_id
+        self.snake = None  # 死亡或等待出生时为 None
+        self.respawn_tick = respawn_tick
+        self.deaths = 0
+
+
+class ArenaDelta:
+    """ 一个逻辑帧内的全部变化 """
+    __slots__ = ('tick', 'moves', 'tails', 'deaths', 'spawns', 'scores', 'food_removed', 'food_added', 'checksum')
+
+    def __init__(self, tick):
+        self.tick = tick
+        self.moves = []  # [(编号, 方向编号), ...]
+        self.tails = []  # 本帧让出蛇尾的玩家编号
+        self.deaths = []
+        self.spawns = []  # [(编号, 格子, 方向编号), ...]
+        self.scores = []  # [(编号, 新分数), ...]
+        self.food_removed = []
+        self.food_added = []
+        self.checksum = 0
+
+    def encode(self):
+        out = [DELTA_HEADER.pack(MSG_DELTA, self.tick, len(self.moves), len(self.tails), len(self.deaths),
+                                 len(self.spawns), len(self.scores), len(self.food_removed),
+                                 len(self.food_added), self.checksum)]
+        if self.moves:
+            out.append(struct.pack(f'<{len(self.moves)}H', *(pid for pid, _ in self.moves)))
+            out.append(bytes(d for _, d in self.moves))
+        out.append(struct.pack(f'<{len(self.tails)}H', *self.tails))
+        out.append(struct.pack(f'<{len(self.deaths)}H', *self.deaths))
+        out.extend(SPAWN.pack(*spawn) for spawn in self.spawns)
+        out.extend(SCORE.pack(pid, min(score, 0xffff)) for pid, score in self.scores)
+        out.append(_pack_cells(self.food_removed))
+        out.append(_pack_cells(self.food_added))
+        return b''.join(out)
+
+
+class ArenaWorld:
+    """ 竞技场规则：多条蛇同时移动，蛇尾在让出的那一帧仍算占用（与单人规则一致）
+
+    撞上障碍物、任何蛇身，或与别的蛇同时进入同一格都算死亡，死亡的蛇身直接清空，
+    RESPAWN_TICKS 帧后在随机空格重生。
+    """
+
+    def __init__(self, width=ARENA_WIDTH, height=ARENA_HEIGHT, rng=None, obstacle_count=ARENA_OBSTACLES):
+        if width * height > DENSE_BOARD_LIMIT:
+            raise ValueError(f'竞技场棋盘最多 {DENSE_BOARD_LIMIT} 格: {width}x{height}')
+        self.width = width
+        self.height = height
+        self.rng = rng if rng is not None else random.Random()
+        self.board = make_board(width, height)
+        self.obstacles = Obstacle(self.board, self.rng, obstacle_count)
+        self.obstacles.generate()
+        self.food = set()
+        self.players = {}
+        self.ticks = 0
+        self._leaving = set()
+        self._next_id = 0
+        self._refill()
+
+    def join(self):
+        """ 加入一名玩家，下一帧出生，返回玩家编号 """
+        while self._next_id in self.players:
+            self._next_id = (self._next_id + 1) & 0xffff
+        pid = self._next_id
+        self._next_id = (pid + 1) & 0xffff
+        self.players[pid] = ArenaPlayer(pid, self.ticks + 1)
+        return pid
+
+    def leave(self, pid):
+        # 下一帧才移除，两帧之间发出的快照和之后的变化保持一致
+        if pid in self.players:
+            self._leaving.add(pid)
+
+    def handle_input(self, pid, direction):
+        player = self.players.get(pid)
+        if player is not None and player.snake is not None:
+            player.snake.handle_input(direction)
+
+    def step(self):
+        """ 推进一个逻辑帧，返回本帧的 ArenaDelta """
+        self.ticks += 1
+        board = self.board
+        cells = board.cells
+        w, h = self.width, self.height
+        delta = ArenaDelta(self.ticks)
+        players = self.players
+
+        for pid in self._leaving:
+            player = players.pop(pid)
+            if player.snake is not None:
+                self._kill(player)
+                delta.deaths.append(pid)
+        self._leaving.clear()
+
+        spawned = set()
+        for pid, player in players.items():
+            if player.snake is None and player.respawn_tick <= self.ticks:
+                cell = board.take_random(self.rng, CELL_SNAKE)
+                if cell is None:
+                    continue
+                player.snake = Snake(board, self.rng, start=cell)
+                spawned.add(pid)
+                delta.spawns.append((pid, cell, DIRECTIONS.index(player.snake.direction)))
+
+        # 先按移动前的棋盘判定所有蛇，再统一生效，结果与遍历顺序无关
+        planned = []
+        claims = {}
+        for pid, player in players.items():
+            snake = player.snake
+            if snake is None or pid in spawned:
+                continue
+            if snake.direction_queue:
+                snake.direction = snake.direction_queue.popleft()
+            head = snake.body[0]
+            x, y = snake.direction
+            new = ((head // w + y) % h) * w + (head % w + x) % w
+            planned.append((player, new))
+            claims[new] = claims.get(new, 0) + 1
+        movers = []
+        dead = []
+        for player, new in planned:
+            kind = cells[new]
+            if kind == CELL_SNAKE or kind == CELL_OBSTACLE or claims[new] > 1:
+                dead.append(player)
+            else:
+                movers.append((player, new))
+        for player in dead:
+            self._kill(player)
+            delta.deaths.append(player.id)
+
+        for player, new in movers:
+            snake = player.snake
+            if cells[new] == CELL_FOOD:
+                self.food.discard(new)
+                delta.food_removed.append(new)
+                snake.length += 1
+                snake.score += 1
+                delta.scores.append((player.id, snake.score))
+            snake.body.appendleft(new)
+            board.occupy(new, CELL_SNAKE)
+            delta.moves.append((player.id, DIRECTIONS.index(snake.direction)))
+            if len(snake.body) > snake.length:
+                board.release(snake.body.pop())
+                delta.tails.append(player.id)
+
+        delta.food_added = self._refill()
+        delta.checksum = zlib.crc32(cells)
+        return delta
+
+    def _kill(self, player):
+        board = self.board
+        for c in player.snake.body:
+            board.release(c)
+        player.snake = None
+        player.respawn_tick = self.ticks + RESPAWN_TICKS
+        player.deaths += 1
+
+    def _refill(self):
+        added = []
+        target = MIN_FOOD + len(self.players) // 2
+        while len(self.food) < target:
+            cell = self.board.take_random(self.rng, CELL_FOOD)
+            if cell is None:
+                break
+            self.food.add(cell)
+            added.append(cell)
+        return added
+
+    def snapshot(self, pid, rate):
+        """ 发给新连接的完整状态 """
+        board = self.board
+        snakes = [(p.id, p.snake) for p in self.players.values() if p.snake is not None]
+        out = [SNAPSHOT_HEADER.pack(MSG_SNAPSHOT, self.ticks, self.width, self.height, pid, rate,
+                                    len(self.obstacles.positions), len(self.food), len(snakes)),
+               _pack_cells([board.index(p) for p in self.obstacles.positions]),
+               _pack_cells(sorted(self.food))]
+        for sid, snake in snakes:
+            out.append(SNAKE_HEADER.pack(sid, min(snake.score, 0xffff), DIRECTIONS.index(snake.direction),
+                                         len(snake.body)))
+            out.append(_pack_cells(snake.body))
+        return b''.join(out)
+
+
+class ArenaMirror:
+    """ 客户端的棋盘镜像：用快照初始化，之后逐帧应用变化；apply() 发现不一致时返回 False """
+
+    def __init__(self, payload):
+        if not payload or payload[0] != MSG_SNAPSHOT or len(payload) < SNAPSHOT_HEADER.size:
+            raise ProtocolError('第一条消息必须是快照')
+        (_, self.tick, self.width, self.height, self.player_id, self.rate,
+         n_obstacles, n_food, n_snakes) = SNAPSHOT_HEADER.unpack_from(payload)
+        # 镜像从不随机取空格，不维护空格表，直接写占用表
+        self.board = board = make_board(self.width, self.height)
+        board.free = board.slot = None
+        cells = board.cells
+        pos = SNAPSHOT_HEADER.size
+        obstacles, pos = _unpack('I', n_obstacles, payload, pos)
+        for c in obstacles:
+            cells[c] = CELL_OBSTACLE
+        food, pos = _unpack('I', n_food, payload, pos)
+        self.food = set(food)
+        for c in food:
+            cells[c] = CELL_FOOD
+        self.snakes = {}
+        for _ in range(n_snakes):
+            if pos + SNAKE_HEADER.size > len(payload):
+                raise ProtocolError('消息被截断')
+            sid, score, d, length = SNAKE_HEADER.unpack_from(payload, pos)
+            body, pos = _unpack('I', length, payload, pos + SNAKE_HEADER.size)
+            snake = self._add_snake(sid, body[0], d)
+            snake.body.extend(body[1:])
+            snake.length = length
+            snake.score = score
+            for c in body[1:]:
+                cells[c] = CELL_SNAKE
+        self.desyncs = 0
+
+    def _add_snake(self, sid, cell, d):
+        snake = Snake(self.board, start=cell)
+        snake.direction = DIRECTIONS[d]
+        self.board.cells[cell] = CELL_SNAKE
+        self.snakes[sid] = snake
+        return snake
+
+    @property
+    def me(self):
+        return self.snakes.get(self.player_id)
+
+    def apply(self, payload):
+        if not payload or payload[0] != MSG_DELTA or len(payload) < DELTA_HEADER.size:
+            raise ProtocolError('不是变化消息')
+        (_, tick, n_moves, n_tails, n_deaths, n_spawns, n_scores, n_removed, n_added,
+         checksum) = DELTA_HEADER.unpack_from(payload)
+        cells = self.board.cells
+        w, h = self.width, self.height
+        pos = DELTA_HEADER.size
+        move_ids, pos = _unpack('H', n_moves, payload, pos)
+        move_dirs, pos = _unpack('B', n_moves, payload, pos)
+        tails, pos = _unpack('H', n_tails, payload, pos)
+        deaths, pos = _unpack('H', n_deaths, payload, pos)
+        if pos + n_spawns * SPAWN.size + n_scores * SCORE.size > len(payload):
+            raise ProtocolError('消息被截断')
+        spawns = [SPAWN.unpack_from(payload, pos + i * SPAWN.size) for i in range(n_spawns)]
+        pos += n_spawns * SPAWN.size
+        scores = [SCORE.unpack_from(payload, pos + i * SCORE.size) for i in range(n_scores)]
+        pos += n_scores * SCORE.size
+        removed, pos = _unpack('I', n_removed, payload, pos)
+        added, pos = _unpack('I', n_added, payload, pos)
+
+        # 与 ArenaWorld.step 相同的顺序：死亡、出生、移动、蛇尾、食物
+        for sid in deaths:
+            snake = self.snakes.pop(sid, None)
+            if snake is not None:
+                for c in snake.body:
+                    cells[c] = CELL_EMPTY
+        for sid, cell, d in spawns:
+            self._add_snake(sid, cell, d)
+        for sid, d in zip(move_ids, move_dirs):
+            snake = self.snakes[sid]
+            snake.direction = x, y = DIRECTIONS[d]
+            head = snake.body[0]
+            new = ((head // w + y) % h) * w + (head % w + x) % w
+            snake.body.appendleft(new)
+            cells[new] = CELL_SNAKE
+        for sid in tails:
+            cells[self.snakes[sid].body.pop()] = CELL_EMPTY
+        for sid, score in scores:
+            snake = self.snakes[sid]
+            snake.score = score
+            snake.length += 1
+        for c in removed:
+            self.food.discard(c)
+        for c in added:
+            self.food.add(c)
+            cells[c] = CELL_FOOD
+
+        ok = tick == self.tick + 1 and zlib.crc32(cells) == checksum
+        self.tick = tick
+        if not ok:
+            self.desyncs += 1
+        return ok
+
+
+class ArenaServer:
+    """ 节拍循环加每连接一个读任务，全部跑在同一个事件循环里 """
+
+    def __init__(self, world, rate=ARENA_RATE):
+        self.world = world
+        self.rate = rate
+        self.clients = {}  # 玩家编号 -> StreamWriter
+        self.clock = TickClock(rate)
+        self.profiler = FrameProfiler()  # 每个逻辑帧算一帧，阶段为 step / encode / broadcast
+        self.bytes_sent = 0
+        self.dropped = 0  # 因积压被断开的慢客户端
+        self.peak_clients = 0
+        self.running = False
+
+    async def handle(self, reader, writer):
+        world = self.world
+        pid = world.join()
+        # 快照和加入在两帧之间同步完成，之后的变化紧接着写在同一个连接上
+        writer.write(frame(world.snapshot(pid, self.rate)))
+        self.clients[pid] = writer
+        try:
+            while True:
+                payload = await read_message(reader, MAX_INPUT_MESSAGE)
+                if len(payload) == INPUT.size and payload[0] == MSG_INPUT and payload[1] < len(DIRECTIONS):
+                    world.handle_input(pid, DIRECTIONS[payload[1]])
+        except (asyncio.IncompleteReadError, ConnectionError, ProtocolError):
+            pass
+        finally:
+            self.clients.pop(pid, None)
+            world.leave(pid)
+            await close_writer(writer)
+
+    def tick(self):
+        profiler = self.profiler
+        start = profiler.begin_frame()
+        delta = self.world.step()
+        start = profiler.record('step', start)
+        data = frame(delta.encode())
+        start = profiler.record('encode', start)
+        self.peak_clients = max(self.peak_clients, len(self.clients))
+        for pid, writer in list(self.clients.items()):
+            if writer.transport.get_write_buffer_size() > MAX_PENDING_BYTES:
+                self.dropped += 1
+                del self.clients[pid]
+                writer.transport.abort()
+                continue
+            writer.write(data)
+            self.bytes_sent += len(data)
+        profiler.record('broadcast', start)
+        profiler.end_frame()
+
+    async def run(self):
+        """ 固定节拍运行直到 stop()；落后时由 TickClock 补跑，超过上限的帧计入 overruns """
+        loop = asyncio.get_running_loop()
+        clock = self.clock
+        clock.reset(loop.time() * 1000)
+        self.running = True
+        while self.running:
+            clock.advance(loop.time() * 1000)
+            while clock.consume():
+                self.tick()
+            await asyncio.sleep(max(clock.step_ms - clock.accumulator, 0) / 1000)
+
+    def stop(self):
+        self.running = False
+
+    def report(self):
+        stats = self.profiler.stats()
+        phases = self.profiler.phase_stats()
+        lines = [f'连接峰值 {self.peak_clients}，逻辑帧 {self.world.ticks}，'
+                 f'补帧 {self.clock.late_frames}，丢帧 {self.clock.overruns}，断开慢客户端 {self.dropped}']
+        if stats is not None:
+            p50, p99, rate = stats
+            lines.append(f'单帧耗时 p50 {p50:.2f}ms p99 {p99:.2f}ms（预算 {self.clock.step_ms:.1f}ms），'
+                         f'平均每帧广播 {self.bytes_sent / max(self.world.ticks, 1) / 1024:.1f} KiB')
+        for phase, (count, p50, p99) in phases.items():
+            lines.append(f'  {phase:<10s} p50 {p50:.3f}ms p99 {p99:.3f}ms')
+        return '\n'.join(lines)
+
+
+def bot_decide(mirror, rng, turn_chance=0.2):
+    """ 模拟客户端的策略：避开下一格的障碍和蛇身，偶尔随机转向；不需要转向时返回 None """
+    snake = mirror.me
+    if snake is None:
+        return None
+    w, h = mirror.width, mirror.height
+    head = snake.body[0]
+    safe = []
+    for d in DIRECTIONS:
+        if d == (-snake.direction[0], -snake.direction[1]):
+            continue
+        cell = ((head // w + d[1]) % h) * w + (head % w + d[0]) % w
+        if mirror.board.cells[cell] in (CELL_EMPTY, CELL_FOOD):
+            safe.append(d)
+    if not safe or (snake.direction in safe and rng.random() >= turn_chance):
+        return None
+    return rng.choice(safe)
+
+
+async def run_bot(host, port, duration, seed):
+    """ 一个模拟客户端：维护镜像、按镜像决策，返回统计 """
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    stats = {'messages': 0, 'bytes': 0, 'desyncs': 0, 'inputs': 0}
+    deadline = asyncio.get_running_loop().time() + duration
+    try:
+        payload = await read_message(reader)
+        mirror = ArenaMirror(payload)
+        while asyncio.get_running_loop().time() < deadline:
+            payload = await read_message(reader)
+            stats['messages'] += 1
+            stats['bytes'] += len(payload) + LENGTH.size
+            if not mirror.apply(payload):
+                stats['desyncs'] += 1
+            direction = bot_decide(mirror, rng)
+            if direction is not None:
+                writer.write(frame(INPUT.pack(MSG_INPUT, DIRECTIONS.index(direction))))
+                stats['inputs'] += 1
+    finally:
+        await close_writer(writer)
+    return stats
+
+
+async def run_bots(host, port, clients, duration, seed):
+    rng = random.Random(seed)
+    results = await asyncio.gather(*(run_bot(host, port, duration, rng.getrandbits(63)) for _ in range(clients)),
+                                   return_exceptions=True)
+    total = {'clients': clients, 'errors': 0, 'messages': 0, 'bytes': 0, 'desyncs': 0, 'inputs': 0}
+    for r in results:
+        if isinstance(r, BaseException):
+            total['errors'] += 1
+            continue
+        for key, value in r.items():
+            total[key] += value
+    return total
+
+
+def _bot_process(host, port, clients, duration, seed, queue):
+    queue.put(asyncio.run(run_bots(host, port, clients, duration, seed)))
+
+
+async def serve(args):
+    server = ArenaServer(ArenaWorld(args.width, args.height, random.Random(args.seed)), args.rate)
+    listener = await asyncio.start_server(server.handle, args.host, args.port)
+    print(f'竞技场已启动: {args.host}:{listener.sockets[0].getsockname()[1]}，{args.rate} 帧/秒')
+    async with listener:
+        try:
+            await server.run()
+        finally:
+            print(server.report())
+
+
+async def loadtest(args):
+    # 服务器跑在本进程，模拟客户端跑在子进程，经本机回环连接
+    server = ArenaServer(ArenaWorld(args.width, args.height, random.Random(args.seed)), args.rate)
+    listener = await asyncio.start_server(server.handle, '127.0.0.1', 0)
+    port = listener.sockets[0].getsockname()[1]
+    queue = multiprocessing.Queue()
+    bots = multiprocessing.Process(target=_bot_process,
+                                   args=('127.0.0.1', port, args.clients, args.duration, args.seed, queue))
+    ticker = asyncio.create_task(server.run())
+    start = time.perf_counter()
+    bots.start()
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(None, queue.get)
+    await loop.run_in_executor(None, bots.join)
+    server.stop()
+    await ticker
+    listener.close()
+    await listener.wait_closed()
+    print(server.report())
+    print(f"{result['clients']} 个模拟客户端，{time.perf_counter() - start:.1f} 秒，连接失败 {result['errors']}，"
+          f"收到 {result['messages']} 条（{result['bytes'] / 1024:.0f} KiB），发送输入 {result['inputs']} 次，"
+          f"镜像不一致 {result['desyncs']} 次")
+    ok = not result['errors'] and not result['desyncs'] and not server.clock.overruns
+    return 0 if ok else 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='贪吃蛇多人竞技场')
+    sub = parser.add_subparsers(dest='command', required=True)
+    for name, help_text in (('serve', '启动服务器'), ('loadtest', '本机起服务器并用模拟客户端压测')):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument('--width', type=int, default=ARENA_WIDTH)
+        p.add_argument('--height', type=int, default=ARENA_HEIGHT)
+        p.add_argument('--rate', type=int, default=ARENA_RATE, help='每秒逻辑帧数')
+        p.add_argument('--seed', type=int, default=None)
+    p = sub.choices['serve']
+    p.add_argument('--host', default='0.0.0.0')
+    p.add_argument('--port', type=int, default=9999)
+    p = sub.choices['loadtest']
+    p.add_argument('--clients', type=int, default=120)
+    p.add_argument('--duration', type=float, default=10.0, help='每个模拟客户端连接的秒数')
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        try:
+            asyncio.run(serve(args))
+        except KeyboardInterrupt:
+            pass
+        return 0
+    return asyncio.run(loadtest(args))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
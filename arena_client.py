@@ -0,0 +1,117 @@
+import argparse
+import queue
+import socket
+import sys
+import threading
+
+import pygame
+
+import snake_game
+from arena import INPUT, LENGTH, MAX_MESSAGE, MSG_INPUT, ArenaMirror, frame
+from persistence import MemoryStore, user_data_dir
+from snake_core import DIRECTIONS, UP, DOWN, LEFT, RIGHT
+from snake_game import FONT_CACHE_FILE, Camera, Game, WINDOW_WIDTH, WINDOW_HEIGHT
+
+# 竞技场客户端：网络线程收消息放进队列，主循环把变化应用到棋盘镜像，再用 Game 的绘制函数画出视口
+#
+#   python arena_client.py --host 127.0.0.1 --port 9999
+
+KEYS = {pygame.K_UP: UP, pygame.K_DOWN: DOWN, pygame.K_LEFT: LEFT, pygame.K_RIGHT: RIGHT}
+
+
+def recv_exact(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError('服务器关闭了连接')
+        data += chunk
+    return bytes(data)
+
+
+def receive(sock, inbox):
+    # 网络线程：逐条读出消息交给主循环，连接断开时放入 None
+    try:
+        while True:
+            size, = LENGTH.unpack(recv_exact(sock, LENGTH.size))
+            if size == 0 or size > MAX_MESSAGE:
+                break
+            inbox.put(recv_exact(sock, size))
+    except OSError:
+        pass
+    inbox.put(None)
+
+
+def draw_arena(game, mirror, camera):
+    # 只画视口内的格子，所有蛇、食物和障碍物一次 blits 画完；蛇头按所属蛇的方向画眼睛
+    screen = snake_game.screen
+    game.draw_background(game.theme['background'])
+    game.draw_sprites(camera.visible(), {snake.body[0]: snake.direction for snake in mirror.snakes.values()})
+    me = mirror.me
+    # 分数栏的最高分显示竞技场里当前分数最高的蛇，而不是本机存档
+    game.high_score = max((snake.score for snake in mirror.snakes.values()), default=0)
+    game.draw_hud(me.score if me else 0)
+    if me is None:
+        text = game.text(game.font, '等待重生...', game.theme['text'])
+        screen.blit(text, text.get_rect(center=(WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='贪吃蛇竞技场客户端')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9999)
+    args = parser.parse_args(argv)
+
+    sock = socket.create_connection((args.host, args.port))
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    inbox = queue.Queue()
+    threading.Thread(target=receive, args=(sock, inbox), daemon=True).start()
+
+    snake_game.init_display()
+    # 只借用绘制：读入本机的字体缓存，但不读分数、不写数据目录
+    game = Game(MemoryStore.preload(user_data_dir(), [FONT_CACHE_FILE]))
+    clock = pygame.time.Clock()
+    mirror = None
+    camera = None
+    following = False
+
+    while True:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                sock.close()
+                snake_game.quit_game(game)
+            if event.type == pygame.KEYDOWN and event.key in KEYS:
+                sock.sendall(frame(INPUT.pack(MSG_INPUT, DIRECTIONS.index(KEYS[event.key]))))
+
+        changed = False
+        while True:
+            try:
+                payload = inbox.get_nowait()
+            except queue.Empty:
+                break
+            if payload is None:
+                print('与服务器的连接已断开')
+                snake_game.quit_game(game)
+            if mirror is None:
+                mirror = ArenaMirror(payload)
+                camera = Camera(mirror.board)
+            elif not mirror.apply(payload):
+                print(f'警告：第 {mirror.tick} 帧的棋盘与服务器不一致')
+            changed = True
+
+        if changed:
+            me = mirror.me
+            if me is None:
+                following = False
+            elif not following:
+                camera.center(me.body[0])  # 出生或重生后先把视口对准自己
+                following = True
+            else:
+                camera.follow(me.body[0])
+            draw_arena(game, mirror, camera)
+            pygame.display.update()
+        clock.tick(60)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,302 @@
+import argparse
+import random
+import time
+from collections import deque
+
+from snake_core import (
+    GRID_WIDTH, GRID_HEIGHT, DEFAULT_SPEED, DIRECTIONS, CELL_OBSTACLE, CELL_SNAKE, DEAD, WIN, SnakeEngine
+)
+
+# 自动驾驶：在环绕棋盘上寻路并通过 Snake.handle_input 控制蛇，用于压力测试和演示模式
+#
+# 寻路按时间感知的 BFS 进行：每节蛇身记一个插入序号，序号为 s 的一节要到第 s - 尾序号 + 2 + 待生长节数
+# 步才能进入，所以路径可以穿过届时已经让出的格子。序号表随蛇每走一步增量更新，搜索前不必重建。
+# 吃到食物前先模拟走完这条路，确认新蛇头还能追上蛇尾，否则改为追着蛇尾绕圈。
+# 规划出的路径在下一帧仍然有效（局面只在吃到食物时随机变化），所以食物不变时直接沿用，不再搜索。
+
+FREE = -(1 << 60)  # 空格的序号，永远不阻挡
+WALL = 1 << 60  # 障碍物的序号，永远阻挡
+NODE_BUDGET = 10000  # 每次决策最多展开的格子数，每格约 3µs，用完也在最高速度 40ms 的逻辑帧之内
+
+
+class OutOfBudget(Exception):
+    """ 本次决策的搜索预算用完 """
+
+
+def neighbor_table(width, height):
+    """ nxt[d][c]：格子 c 沿 DIRECTIONS[d] 前进一格（环绕）后的格子 """
+    table = []
+    for dx, dy in DIRECTIONS:
+        table.append([((c // width + dy) % height) * width + (c % width + dx) % width
+                      for c in range(width * height)])
+    return table
+
+
+class Autopilot:
+    """ 为一个 SnakeEngine 逐帧给出方向；decide() 返回方向元组，无路可走时返回 None """
+
+    def __init__(self, engine, budget=NODE_BUDGET):
+        self.engine = engine
+        self.budget = budget
+        self._left = budget  # 本次决策还能展开的格子数
+        board = engine.board
+        self.cells = board.width * board.height
+        self.nxt = neighbor_table(board.width, board.height)
+        # 每格的蛇身插入序号，与 engine 的蛇身逐帧同步
+        self._serial = [FREE] * self.cells
+        self._mirror = deque()  # 上次同步时的蛇身
+        self._head_serial = 0
+        self._synced_tick = None
+        # BFS 用的访问标记和父节点表，按代号复用，不必每次清零
+        self._seen = [0] * self.cells
+        self._parent = [0] * self.cells
+        self._stamp = 0
+        self._plan = deque()  # 还没走的路径格子
+        self._plan_food = None
+        self._expected_head = None
+        # 统计
+        self.decisions = 0
+        self.searches = 0
+        self.reused = 0
+        self.fallbacks = 0  # 预算用完、改走一步安全格子的次数
+        self.elapsed = 0.0
+
+    @property
+    def decisions_per_second(self):
+        return self.decisions / self.elapsed if self.elapsed else 0.0
+
+    def reset(self):
+        self._plan.clear()
+        self._plan_food = None
+        self._expected_head = None
+        self._synced_tick = None
+
+    def decide(self):
+        start = time.perf_counter()
+        self._sync()
+        self._left = self.budget
+        try:
+            direction = self._decide()
+        except OutOfBudget:
+            # 搜索超出预算时不再等结果，先走一步眼下安全的格子，下一帧重新规划
+            self.fallbacks += 1
+            self._plan.clear()
+            direction = self._safe_step()
+        self.elapsed += time.perf_counter() - start
+        self.decisions += 1
+        return direction
+
+    def _sync(self):
+        # 正常情况下距上次只走了一步：插入新蛇头、弹出让出的蛇尾；其余情况（开局、跳帧）整表重建
+        engine = self.engine
+        body = engine.snake.body
+        mirror = self._mirror
+        serial = self._serial
+        if self._synced_tick == engine.ticks - 1 and mirror and mirror[0] != body[0]:
+            self._head_serial += 1
+            mirror.appendleft(body[0])
+            serial[body[0]] = self._head_serial
+            while len(mirror) > len(body):
+                serial[mirror.pop()] = FREE
+        elif self._synced_tick != engine.ticks or not mirror or mirror[0] != body[0]:
+            serial[:] = [FREE] * self.cells
+            for pos in engine.obstacles.positions:
+                serial[engine.board.index(pos)] = WALL
+            for k, c in enumerate(reversed(body)):
+                serial[c] = k
+            self._head_serial = len(body) - 1
+            mirror.clear()
+            mirror.extend(body)
+            self._plan.clear()
+        self._synced_tick = engine.ticks
+
+    def _decide(self):
+        engine = self.engine
+        snake = engine.snake
+        if snake.direction_queue:
+            return None  # 还有没消耗的手动输入，不打断
+        head = snake.body[0]
+        board = engine.board
+        food = None if engine.food.position is None else board.index(engine.food.position)
+
+        # 食物没变、蛇头在预期位置，且下一格现在是空的：沿用上次的路径
+        plan = self._plan
+        if plan and food == self._plan_food and head == self._expected_head:
+            nxt_cell = plan[0]
+            if board.cells[nxt_cell] not in (CELL_SNAKE, CELL_OBSTACLE):
+                plan.popleft()
+                self._expected_head = nxt_cell
+                self.reused += 1
+                return self._direction_to(head, nxt_cell)
+        plan.clear()
+
+        body = snake.body
+        banned = self._reverse_of(head, snake.direction)
+        if food is not None:
+            base = self._base(body[-1], snake.length - len(body))
+            path = self._search(head, base, food, banned)
+            if path is not None and self._tail_reachable(path, body, snake.length):
+                return self._follow(head, path, food)
+        return self._stall(head, body, snake.length, banned)
+
+    def _safe_step(self):
+        # 下一帧能进入的格子，优先保持当前方向；都不能进入时返回 None
+        snake = self.engine.snake
+        head = snake.body[0]
+        body = snake.body
+        base = self._base(body[-1], snake.length - len(body))
+        banned = self._reverse_of(head, snake.direction)
+        order = [DIRECTIONS.index(snake.direction)] + list(range(len(DIRECTIONS)))
+        for d in order:
+            n = self.nxt[d][head]
+            if n != banned and self._serial[n] - base <= 1:
+                return DIRECTIONS[d]
+        return None
+
+    def _base(self, tail, growth):
+        # 序号为 s 的一节在第 s - base 步才能进入：蛇尾在让出的那一步仍算占用
+        return self._serial[tail] - 2 - growth
+
+    def _follow(self, head, path, food):
+        self._plan.extend(path[1:])
+        self._plan_food = food
+        self._expected_head = path[0]
+        return self._direction_to(head, path[0])
+
+    def _virtual(self, path, body, length, search):
+        # 假设沿 path 走完（path[0] 为第一步），临时写入新蛇身的序号，调用 search(新蛇尾, base) 后恢复
+        serial = self._serial
+        saved = [serial[c] for c in path]
+        for i, c in enumerate(path):
+            serial[c] = self._head_serial + 1 + i
+        size = min(len(body) + len(path), length)
+        tail = path[len(path) - size] if size <= len(path) else body[size - len(path) - 1]
+        try:
+            return search(tail, self._base(tail, length - size))
+        finally:
+            for c, value in zip(path, saved):
+                serial[c] = value
+
+    def _tail_reachable(self, path, body, length):
+        # 模拟沿路径吃到食物后的蛇身（吃到后长度加一），检查新蛇头能否追上新蛇尾
+        if min(len(body) + len(path), length) < 3:
+            return True
+        return self._virtual(path, body, length + 1,
+                             lambda tail, base: self._search(path[-1], base, tail, None)) is not None
+
+    def _stall(self, head, body, length, banned):
+        # 没有安全的路去吃食物：选一步之后仍能追上蛇尾、且离蛇尾最远的方向，拖延时间等待局面变化；
+        # 绕圈时蛇身在变化，所以每帧都重新判断，不沿用路径
+        base = self._base(body[-1], length - len(body))
+        serial = self._serial
+        best = None
+        fallback = None
+        fallback_area = -1
+        for d in range(len(DIRECTIONS)):
+            n = self.nxt[d][head]
+            if n == banned or serial[n] - base > 1:
+                continue
+            if min(len(body) + 1, length) == 1:
+                return self._direction_to(head, n)  # 单节蛇走哪都追得上自己
+            reverse = self._reverse_of(n, DIRECTIONS[d])
+            path = self._virtual([n], body, length,
+                                 lambda tail, b: self._search(n, b, tail, reverse))
+            if path is not None:
+                if best is None or len(path) > len(best) - 1:
+                    best = [n] + path
+                continue
+            area = self._virtual([n], body, length, lambda tail, b: self._search(n, b, None, None))
+            if area > fallback_area:
+                fallback, fallback_area = n, area
+        if best is not None:
+            return self._direction_to(head, best[0])
+        return None if fallback is None else self._direction_to(head, fallback)
+
+    def _search(self, start, base, goal, banned):
+        """ 时间感知的 BFS：goal 为 None 时返回可达格子数，否则返回到 goal 的路径（不含起点）或 None """
+        self.searches += 1
+        self._stamp += 1
+        stamp = self._stamp
+        seen = self._seen
+        parent = self._parent
+        serial = self._serial
+        nxt = self.nxt
+        seen[start] = stamp
+        if banned is not None:
+            seen[banned] = stamp  # 不能掉头，第一步不能走反方向
+        frontier = [start]
+        reached = 0
+        t = base
+        while frontier:
+            t += 1
+            layer = []
+            # 按层扣预算，用完时放弃这次搜索
+            self._left -= len(frontier)
+            if self._left < 0:
+                raise OutOfBudget
+            for c in frontier:
+                for table in nxt:
+                    n = table[c]
+                    if seen[n] == stamp or serial[n] > t:
+                        continue
+                    seen[n] = stamp
+                    parent[n] = c
+                    if n == goal:
+                        path = [n]
+                        while parent[n] != start:
+                            n = parent[n]
+                            path.append(n)
+                        path.reverse()
+                        return path
+                    layer.append(n)
+            reached += len(layer)
+            frontier = layer
+        return reached if goal is None else None
+
+    def _direction_to(self, cell, target):
+        for d, table in enumerate(self.nxt):
+            if table[cell] == target:
+                return DIRECTIONS[d]
+        return None
+
+    def _reverse_of(self, head, direction):
+        return self.nxt[DIRECTIONS.index((-direction[0], -direction[1]))][head]
+
+
+def play(engine, pilot, max_ticks):
+    """ 自动驾驶一局，返回 (事件, 分数) """
+    event, score = None, engine.score
+    while engine.alive and engine.ticks < max_ticks:
+        direction = pilot.decide()
+        event, score = engine.step(direction)
+    return event, score
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='贪吃蛇自动驾驶压力测试')
+    parser.add_argument('--games', type=int, default=10)
+    parser.add_argument('--width', type=int, default=GRID_WIDTH)
+    parser.add_argument('--height', type=int, default=GRID_HEIGHT)
+    parser.add_argument('--speed', type=int, default=DEFAULT_SPEED)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--max-ticks', type=int, default=200000, help='单局逻辑帧上限，防止绕圈不结束')
+    args = parser.parse_args(argv)
+
+    seeds = random.Random(args.seed)
+    engine = SnakeEngine(args.speed, args.width, args.height, random.Random())
+    pilot = Autopilot(engine)
+    total_ticks = 0
+    for game in range(args.games):
+        seed = seeds.getrandbits(63)
+        engine.reset(args.speed, seed)
+        pilot.reset()
+        event, score = play(engine, pilot, args.max_ticks)
+        total_ticks += engine.ticks
+        result = {DEAD: '死亡', WIN: '通关'}.get(event, '超时')
+        print(f'第 {game + 1} 局 种子 {seed}: {score} 分，{engine.ticks} 帧，{result}')
+    print(f'共 {total_ticks} 帧，决策 {pilot.decisions_per_second:,.0f} 次/秒，'
+          f'搜索 {pilot.searches} 次，沿用路径 {pilot.reused} 次，超出预算 {pilot.fallbacks} 次')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from snake_core import DIRECTIONS, DEAD, SnakeEngine  # noqa: E402
+from snake_batch import EVENT_NAMES, BatchSnakeEnv  # noqa: E402
+
+# 对比逐局 Python 循环与批量环境的吞吐量（局·帧/秒），并校验两者结果逐位一致
+
+
+def bench_scalar(num_envs, ticks, seed=0):
+    engines = [SnakeEngine(rng=random.Random(seed + i)) for i in range(num_envs)]
+    actions = np.random.default_rng(seed).integers(-1, 4, (ticks, num_envs)).tolist()
+    start = time.perf_counter()
+    for row in actions:
+        for engine, a in zip(engines, row):
+            event, _ = engine.step(None if a < 0 else DIRECTIONS[a])
+            if event == DEAD:
+                engine.reset()
+    return num_envs * ticks / (time.perf_counter() - start)
+
+
+def bench_batch(num_envs, ticks, seed=0):
+    """ 返回 (含重开的吞吐量, 只算 step() 的吞吐量) """
+    env = BatchSnakeEnv(num_envs, seeds=range(seed, seed + num_envs))
+    actions = np.random.default_rng(seed).integers(-1, 4, (ticks, num_envs))
+    stepping = 0.0
+    start = time.perf_counter()
+    for row in actions:
+        t = time.perf_counter()
+        env.step(row)
+        stepping += time.perf_counter() - t
+        if not env.alive.all():
+            env.reset(np.flatnonzero(~env.alive))
+    return num_envs * ticks / (time.perf_counter() - start), num_envs * ticks / stepping
+
+
+def check_identical(num_envs=64, ticks=2000, seed=0):
+    env = BatchSnakeEnv(num_envs, seeds=range(seed, seed + num_envs))
+    engines = [SnakeEngine(rng=random.Random(seed + i)) for i in range(num_envs)]
+    actions = np.random.default_rng(seed).integers(-1, 4, (ticks, num_envs))
+    for row in actions:
+        events, scores = env.step(row)
+        for i, engine in enumerate(engines):
+            event, score = engine.step(None if row[i] < 0 else DIRECTIONS[row[i]])
+            if EVENT_NAMES[events[i]] != event or scores[i] != score:
+                return False
+            if event != DEAD and env.positions(i) != engine.snake.positions:
+                return False
+            if event == DEAD:
+                engine.reset()
+        if not env.alive.all():
+            env.reset(np.flatnonzero(~env.alive))
+    return True
+
+
+if __name__ == '__main__':
+    ticks = 200
+    print(f"结果一致: {check_identical()}")
+    for n in (1024, 4096):
+        scalar = bench_scalar(n, ticks)
+        batch, stepping = bench_batch(n, ticks)
+        print(f"N={n}: 逐局 {scalar:,.0f} 帧/秒, 批量 {batch:,.0f} 帧/秒, 加速 {batch / scalar:.1f}x"
+              f"（只算 step() {stepping / scalar:.1f}x）")
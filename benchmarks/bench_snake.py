@@ -0,0 +1,55 @@
+import os
+import sys
+import time
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from snake_core import (  # noqa: E402
+    GRID_WIDTH, GRID_HEIGHT, CELL_SNAKE, Board, Snake
+)
+
+# 微基准：蛇长从1到 GRID_WIDTH*GRID_HEIGHT-1，Snake.update 的单帧耗时应保持不变
+
+
+def hamiltonian_cycle(width, height):
+    # 高度为偶数时的哈密顿回路：蛇形扫过第1列以后的所有列，再沿第0列回到起点
+    cycle = []
+    for y in range(height):
+        xs = range(0, width) if y == 0 else (range(width - 1, 0, -1) if y % 2 else range(1, width))
+        cycle.extend((x, y) for x in xs)
+    cycle.extend((0, y) for y in range(height - 1, 0, -1))
+    return cycle
+
+
+def bench_length(length, ticks=20000, width=GRID_WIDTH, height=GRID_HEIGHT):
+    board = Board(width, height)
+    snake = Snake(board)
+    cycle = [board.index(p) for p in hamiltonian_cycle(width, height)]
+    steps = []
+    for i, (x, y) in enumerate(hamiltonian_cycle(width, height)):
+        nx, ny = board.position(cycle[(i + 1) % len(cycle)])
+        steps.append(((nx - x + 1) % width - 1, (ny - y + 1) % height - 1))
+
+    # 沿回路摆好一条指定长度的蛇，头在回路第 length-1 格
+    board.release(snake.body[0])
+    snake.body = deque(reversed(cycle[:length]))
+    for c in snake.body:
+        board.occupy(c, CELL_SNAKE)
+    snake.length = length
+
+    pos = length - 1
+    n = len(cycle)
+    start = time.perf_counter()
+    for _ in range(ticks):
+        snake.direction = steps[pos]
+        if not snake.update():
+            raise RuntimeError("基准中的蛇不应死亡")
+        pos = (pos + 1) % n
+    return (time.perf_counter() - start) / ticks * 1e9
+
+
+if __name__ == '__main__':
+    total = GRID_WIDTH * GRID_HEIGHT
+    for length in (1, 10, 100, 1000, total - 1):
+        print(f"长度 {length:5d}: {bench_length(length):7.1f} ns/帧")
@@ -0,0 +1,357 @@
+import argparse
+import atexit
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import deque
+
+# 无窗口运行：必须在导入 pygame 之前设置
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+# 持久化基准写到临时目录，不碰真实的分数文件；退出时删除（在各 ScoreStore 的 atexit 关闭之后）
+_data_dir = tempfile.TemporaryDirectory(prefix='snake-bench-')
+atexit.register(_data_dir.cleanup)
+os.environ['SNAKE_DATA_DIR'] = _data_dir.name
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pygame  # noqa: E402
+
+import snake_game  # noqa: E402
+from bench_snake import bench_length  # noqa: E402
+from leaderboard import Leaderboard  # noqa: E402
+from snake_core import (  # noqa: E402
+    GRID_WIDTH, GRID_HEIGHT, MIN_SPEED, MAX_SPEED, CELL_SNAKE, Board, Food, Obstacle, SnakeEngine
+)
+
+# 基准套件：覆盖模拟、绘制和持久化的热路径，结果存为 JSON，可与基线对比找出退化
+#
+#   python benchmarks/bench_suite.py --output base.json
+#   python benchmarks/bench_suite.py --compare base.json --threshold 0.1
+#
+# 每项重复多轮，取每次操作耗时的中位数作为比较依据。
+
+BENCHMARKS = []
+
+
+def benchmark(name):
+    def register(fn):
+        BENCHMARKS.append((name, fn))
+        return fn
+    return register
+
+
+def timeit(fn, number):
+    """ 调用 fn number 次，返回每次的纳秒数 """
+    start = time.perf_counter()
+    for _ in range(number):
+        fn()
+    return (time.perf_counter() - start) / number * 1e9
+
+
+def crowded_board(fill, seed=0):
+    # 按比例随机占满棋盘，用于测空格很少时的生成开销
+    board = Board(GRID_WIDTH, GRID_HEIGHT)
+    rng = random.Random(seed)
+    cells = list(range(GRID_WIDTH * GRID_HEIGHT))
+    rng.shuffle(cells)
+    for c in cells[:int(len(cells) * fill)]:
+        board.occupy(c, CELL_SNAKE)
+    return board, rng
+
+
+def long_snake_engine(length, seed=0):
+    # 沿哈密顿回路摆一条指定长度的蛇，用于绘制基准
+    from bench_snake import hamiltonian_cycle
+    engine = SnakeEngine(rng=random.Random(seed))
+    board = engine.board
+    for c in engine.snake.body:
+        board.release(c)
+    cycle = [board.index(p) for p in hamiltonian_cycle(GRID_WIDTH, GRID_HEIGHT)]
+    body = [c for c in reversed(cycle[:length]) if board.cells[c] == 0]
+    engine.snake.body = deque(body)
+    for c in body:
+        board.occupy(c, CELL_SNAKE)
+    engine.snake.length = len(body)
+    return engine
+
+
+def _update_bench(length):
+    def run(quick):
+        return bench_length(length, ticks=2000 if quick else 20000)
+    return run
+
+
+for _length in (1, 100, 1000, GRID_WIDTH * GRID_HEIGHT - 1):
+    benchmark(f'sim/update/len={_length}')(_update_bench(_length))
+
+
+@benchmark('sim/obstacle_generate/fill=0.95')
+def bench_obstacle_generate(quick):
+    board, rng = crowded_board(0.95)
+    obstacles = Obstacle(board, rng)
+    return timeit(obstacles.generate, 2000 if quick else 20000)
+
+
+@benchmark('sim/food_spawn/fill=0.95')
+def bench_food_spawn(quick):
+    board, rng = crowded_board(0.95)
+    food = Food(board, rng)
+    return timeit(food.randomize_position, 5000 if quick else 50000)
+
+
+@benchmark('sim/engine_step')
+def bench_engine_step(quick):
+    engine = SnakeEngine(rng=random.Random(0))
+    rng = random.Random(1)
+    directions = [rng.choice(((0, -1), (0, 1), (-1, 0), (1, 0), None)) for _ in range(1024)]
+    i = [0]
+
+    def step():
+        i[0] = (i[0] + 1) & 1023
+        if not engine.alive:
+            engine.reset()
+        engine.step(directions[i[0]])
+    return timeit(step, 5000 if quick else 50000)
+
+
+def _game():
+    game = snake_game.Game()
+    game.store.close()  # 绘制基准不需要后台写线程
+    return game
+
+
+@benchmark('render/draw_background/cold')
+def bench_draw_background_cold(quick):
+    # 缓存未命中：重新画出整屏网格背景，切换主题后的第一帧就是这种情况
+    game = _game()
+    color = game.theme['background']
+
+    def draw():
+        game.cache.backgrounds.clear()
+        game.draw_background(color)
+    return timeit(draw, 50 if quick else 500)
+
+
+@benchmark('render/draw_background/cached')
+def bench_draw_background_cached(quick):
+    game = _game()
+    color = game.theme['background']
+    game.draw_background(color)
+    return timeit(lambda: game.draw_background(color), 200 if quick else 2000)
+
+
+@benchmark('render/playing_frame/len=300')
+def bench_playing_frame(quick):
+    # 整屏：背景、障碍物、食物、蛇、HUD
+    game = _game()
+    engine = long_snake_engine(300)
+    camera = snake_game.Camera(engine.board)
+
+    def frame():
+        game.draw_playing(engine.snake, engine.food, camera)
+        pygame.display.flip()
+    return timeit(frame, 30 if quick else 300)
+
+
+@benchmark('render/playing_frame/board=2000x2000')
+def bench_large_board_frame(quick):
+    # 大棋盘：视口跟随蛇头，每帧只扫视口内的格子
+    game = _game()
+    engine = SnakeEngine(width=2000, height=2000, rng=random.Random(0), obstacle_count=20000)
+    camera = snake_game.Camera(engine.board)
+    camera.center(engine.snake.body[0])
+
+    def frame():
+        game.draw_playing(engine.snake, engine.food, camera)
+        pygame.display.flip()
+    return timeit(frame, 30 if quick else 300)
+
+
+@benchmark('sim/engine_step/board=2000x2000')
+def bench_large_board_step(quick):
+    # 400万格的棋盘上 reset() 比 step() 慢几个数量级，只计 step() 的耗时
+    engine = SnakeEngine(width=2000, height=2000, rng=random.Random(0), obstacle_count=20000)
+    rng = random.Random(1)
+    directions = [rng.choice(((0, -1), (0, 1), (-1, 0), (1, 0), None)) for _ in range(1024)]
+    number = 5000 if quick else 50000
+    elapsed = 0.0
+    for i in range(number):
+        if not engine.alive:
+            engine.reset()
+        start = time.perf_counter()
+        engine.step(directions[i & 1023])
+        elapsed += time.perf_counter() - start
+    return elapsed / number * 1e9
+
+
+@benchmark('render/dirty_frame')
+def bench_dirty_frame(quick):
+    # PLAYING 状态的增量绘制：每帧推进一步，只重画变化的格子
+    game = _game()
+    engine = long_snake_engine(300)
+    renderer = snake_game.DirtyRenderer(game, snake_game.Camera(engine.board))
+    renderer.render(engine.snake, engine.food)
+    rng = random.Random(0)
+
+    def frame():
+        if not engine.alive:
+            engine.reset()
+            renderer.invalidate()
+        engine.step(rng.choice(((0, -1), (0, 1), (-1, 0), (1, 0))))
+        rects = renderer.render(engine.snake, engine.food)
+        if rects is None:
+            pygame.display.update()
+        elif rects:
+            pygame.display.update(rects)
+    return timeit(frame, 300 if quick else 3000)
+
+
+def _raw_entries(entries=5000, seed=0):
+    rng = random.Random(seed)
+    return [{'name': f'player{i}', 'score': rng.randrange(500), 'speed': rng.randint(MIN_SPEED, MAX_SPEED)}
+            for i in range(entries)]
+
+
+def _big_leaderboard(entries=5000, seed=0):
+    # 每个速度只保留前10名，所以无论原始记录多少，结果都是 12 组、每组10条
+    return Leaderboard.from_list(_raw_entries(entries, seed))
+
+
+@benchmark('leaderboard/from_list/entries=5000')
+def bench_leaderboard_from_list(quick):
+    # 启动时载入排行榜文件：逐条插入并裁剪到每个速度前10名
+    entries = _raw_entries()
+    return timeit(lambda: Leaderboard.from_list(entries), 20 if quick else 200)
+
+
+@benchmark('render/draw_leaderboard/groups=12')
+def bench_draw_leaderboard(quick):
+    game = _game()
+    game.leaderboard = _big_leaderboard()
+    return timeit(game.draw_leaderboard, 30 if quick else 300)
+
+
+@benchmark('leaderboard/add/groups=12')
+def bench_leaderboard_add(quick):
+    board = _big_leaderboard()
+    rng = random.Random(1)
+    scores = [(rng.randrange(500), rng.randint(MIN_SPEED, MAX_SPEED)) for _ in range(1024)]
+    i = [0]
+
+    def add():
+        i[0] = (i[0] + 1) & 1023
+        score, speed = scores[i[0]]
+        board.add('new', score, speed)
+    return timeit(add, 2000 if quick else 20000)
+
+
+@benchmark('io/save_leaderboard')
+def bench_save_leaderboard(quick):
+    # 提交加落盘的完整耗时；游戏循环里只付出提交的那一部分
+    game = snake_game.Game()
+    game.leaderboard = _big_leaderboard()
+    score = [1000]
+
+    def save():
+        # 分数递增，每次都能上榜；进不了前10名的记录不会写盘
+        score[0] += 1
+        game.save_leaderboard('bench', score[0])
+        game.store.flush()
+    try:
+        return timeit(save, 20 if quick else 200)
+    finally:
+        game.store.close()
+
+
+@benchmark('io/save_high_score')
+def bench_save_high_score(quick):
+    game = snake_game.Game()
+    score = [game.high_score]
+
+    def save():
+        score[0] += 1
+        game.save_high_score(score[0])
+        game.store.flush()
+    try:
+        return timeit(save, 20 if quick else 200)
+    finally:
+        game.store.close()
+
+
+def run(selected, repeat, quick):
+    results = {}
+    for name, fn in BENCHMARKS:
+        if selected and not any(s in name for s in selected):
+            continue
+        runs = [fn(quick) for _ in range(repeat)]
+        results[name] = {
+            'median_ns': statistics.median(runs),
+            'min_ns': min(runs),
+            'runs': runs,
+        }
+        print(f'{name:40s} {results[name]["median_ns"] / 1000:10.2f} us')
+    return results
+
+
+def compare(results, baseline, threshold):
+    """ 返回退化项列表 [(名称, 基线, 当前, 比例)]，同时打印对比表 """
+    regressions = []
+    print(f'\n{"基准":40s} {"基线 us":>10s} {"当前 us":>10s} {"变化":>8s}')
+    for name, current in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f'{name:40s} {"-":>10s} {current["median_ns"] / 1000:10.2f} {"新增":>8s}')
+            continue
+        ratio = current['median_ns'] / base['median_ns'] - 1
+        flag = ''
+        if ratio > threshold:
+            regressions.append((name, base['median_ns'], current['median_ns'], ratio))
+            flag = '  退化'
+        print(f'{name:40s} {base["median_ns"] / 1000:10.2f} {current["median_ns"] / 1000:10.2f} {ratio:+8.1%}{flag}')
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='贪吃蛇基准套件')
+    parser.add_argument('--output', help='把结果写入 JSON 文件')
+    parser.add_argument('--compare', metavar='BASELINE', help='与基线 JSON 对比')
+    parser.add_argument('--threshold', type=float, default=0.10, help='中位数变慢超过该比例视为退化')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--quick', action='store_true', help='减少迭代次数，用于冒烟检查')
+    parser.add_argument('filter', nargs='*', help='只运行名称包含这些子串的基准')
+    args = parser.parse_args(argv)
+
+    results = run(args.filter, args.repeat, args.quick)
+    report = {
+        'meta': {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'pygame': pygame.version.ver,
+            'platform': platform.platform(),
+            'quick': args.quick,
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f'\n{len(regressions)} 项退化超过 {args.threshold:.0%}')
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -6,5 +6,7 @@ PyInstaller.__main__.run([
     '--windowed',
     '--add-data', 'high_score.json;.',
     '--add-data', 'leaderboard.json;.',
+    # 游戏本身不用 numpy（只有批量环境用），不排除的话 pygame 的钩子会把它打进包里，拖慢单文件解压
+    '--exclude-module', 'numpy',
     '--name', 'SnakeGame'
 ])
\ No newline at end of file
@@ -0,0 +1,91 @@
+import bisect
+from itertools import count
+
+MAX_LEADERBOARD_ENTRIES = 10  # 排行榜最大记录数
+
+
+class Leaderboard:
+    """ 按速度分组的排行榜，每个速度只保留前 K 名
+
+    每组维护按 (-分数, 序号) 排好序的键列表，插入和查询名次都用二分查找；
+    同分时先上榜的排在前面，与原先的稳定排序一致。显示用的视图只在插入后重建。
+    """
+
+    def __init__(self, max_entries=MAX_LEADERBOARD_ENTRIES):
+        self.max_entries = max_entries
+        self.groups = {}  # 速度 -> (键列表, 记录列表)
+        self._seq = count()
+        self._view = None
+        self.skipped = 0  # from_list 时跳过的坏记录数
+
+    @classmethod
+    def from_list(cls, entries, max_entries=MAX_LEADERBOARD_ENTRIES):
+        # 跳过格式不对的记录，一条坏记录不会让整个排行榜读成空的，下次保存时也不会覆盖掉其余记录
+        board = cls(max_entries)
+        for entry in entries:
+            if not cls.valid(entry):
+                board.skipped += 1
+                continue
+            board.add(entry["name"], entry["score"], entry["speed"], entry.get("replay"))
+        return board
+
+    @staticmethod
+    def valid(entry):
+        return (isinstance(entry, dict) and isinstance(entry.get("name"), str)
+                and isinstance(entry.get("score"), int) and isinstance(entry.get("speed"), int)
+                and isinstance(entry.get("replay", ""), str))
+
+    def add(self, name, score, speed, replay=None):
+        """ 插入一条记录，返回 (名次, 被挤出的记录)；名次从1开始，未进前 K 名为 None，没有挤出记录时为 None
+
+        replay 为该局回放文件相对数据目录的路径，供 replay.py audit 核对分数；
+        被挤出的记录带着它的 replay，调用方据此删除不再需要的回放文件
+        """
+        keys, entries = self.groups.setdefault(speed, ([], []))
+        key = (-score, next(self._seq))
+        pos = bisect.bisect(keys, key)
+        if pos >= self.max_entries:
+            return None, None
+        keys.insert(pos, key)
+        entry = {"name": name, "score": score, "speed": speed}
+        if replay is not None:
+            entry["replay"] = replay
+        entries.insert(pos, entry)
+        evicted = None
+        if len(keys) > self.max_entries:
+            keys.pop()
+            evicted = entries.pop()
+        self._view = None
+        return pos + 1, evicted
+
+    def rank(self, score, speed):
+        """ 该分数在该速度下能排到的名次，进不了前 K 名返回 None """
+        keys = self.groups.get(speed, ((), ()))[0]
+        # 同分时新记录排在已有记录之后
+        pos = bisect.bisect_right(keys, (-score, float('inf')))
+        return pos + 1 if pos < self.max_entries else None
+
+    def qualifies(self, score, speed):
+        return self.rank(score, speed) is not None
+
+    def top(self, speed):
+        return list(self.groups.get(speed, ((), ()))[1])
+
+    def view(self):
+        """ 显示用的视图：[(速度, ["1. 名字: 分数", ...]), ...]，按速度升序 """
+        if self._view is None:
+            self._view = [
+                (speed, [f"{i+1}. {entry['name']}: {entry['score']}"
+                         for i, entry in enumerate(self.groups[speed][1])])
+                for speed in sorted(self.groups)
+            ]
+        return self._view
+
+    def to_list(self):
+        return [entry for speed in sorted(self.groups) for entry in self.groups[speed][1]]
+
+    def __len__(self):
+        return sum(len(keys) for keys, _ in self.groups.values())
+
+    def __iter__(self):
+        return iter(self.to_list())
@@ -0,0 +1,203 @@
+import atexit
+import json
+import os
+import sys
+import tempfile
+import threading
+
+APP_NAME = 'GreedySnake'
+DATA_DIR_ENV = 'SNAKE_DATA_DIR'  # 可用环境变量指定数据目录
+_REMOVE = object()  # 待写队列中表示删除文件的标记
+
+
+def user_data_dir():
+    """ 每个用户固定的数据目录，不随 PyInstaller 的临时解压目录变化 """
+    override = os.environ.get(DATA_DIR_ENV)
+    if override:
+        return override
+    if sys.platform.startswith('win'):
+        base = os.environ.get('APPDATA') or os.path.expanduser('~')
+    elif sys.platform == 'darwin':
+        base = os.path.expanduser('~/Library/Application Support')
+    else:
+        base = os.environ.get('XDG_DATA_HOME') or os.path.expanduser('~/.local/share')
+    return os.path.join(base, APP_NAME)
+
+
+def atomic_write(path, payload):
+    """ 先写同目录下的临时文件并落盘，再原子替换，写到一半崩溃也不会留下半截文件 """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path), suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write_json(path, data):
+    atomic_write(path, json.dumps(data).encode('utf-8'))
+
+
+class ScoreStore:
+    """ 后台写线程的分数存储：游戏循环只提交快照，磁盘写入在后台完成
+
+    同一文件只保留最新一份待写快照（或一次删除），所以待写队列的长度不超过文件数；
+    flush() 等待所有快照写完，close() 在退出时调用（同时注册了 atexit）。
+    """
+
+    def __init__(self, data_dir=None, fallback=None):
+        self.data_dir = data_dir or user_data_dir()
+        self.fallback = fallback  # 数据目录里没有文件时，从这里找随程序打包的初始文件
+        self.errors = []
+        self._pending = {}
+        self._current = None  # 正在写入的文件
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name='score-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def path(self, filename):
+        return os.path.join(self.data_dir, filename)
+
+    def load(self, filename, default=None):
+        # 先等同名文件的待写快照落盘，再读取
+        with self._cond:
+            while filename in self._pending or filename == self._current:
+                self._cond.wait()
+        candidates = [self.path(filename)]
+        if self.fallback is not None:
+            candidates.append(self.fallback(filename))
+        for path in candidates:
+            try:
+                with open(path, 'r') as f:
+                    return json.load(f)
+            except OSError:
+                continue
+            except ValueError:
+                # 数据目录里的文件损坏时先挪到一边，之后的保存不会把它连同能救回的内容一起覆盖
+                if path == candidates[0]:
+                    self.set_aside(filename)
+                continue
+        return default
+
+    def set_aside(self, filename):
+        """ 把读不懂的文件改名为 <文件名>.bad 保留下来，返回新路径；文件不存在时返回 None """
+        path = self.path(filename)
+        backup = path + '.bad'
+        try:
+            os.replace(path, backup)
+        except OSError:
+            return None
+        print(f"警告：{filename} 无法读取，已另存为 {backup}")
+        return backup
+
+    def save(self, filename, data):
+        """ 提交一份快照，立即返回；bytes 原样写入，其余按 JSON 写入 """
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('ScoreStore 已关闭')
+            self._pending[filename] = data
+            self._cond.notify_all()
+
+    def remove(self, filename):
+        """ 提交一次删除，同样由后台线程完成；文件不存在时忽略 """
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('ScoreStore 已关闭')
+            self._pending[filename] = _REMOVE
+            self._cond.notify_all()
+
+    def flush(self):
+        with self._cond:
+            while self._pending or self._current is not None:
+                self._cond.wait()
+
+    def close(self):
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                filename, data = self._pending.popitem()
+                self._current = filename
+            try:
+                if data is _REMOVE:
+                    try:
+                        os.remove(self.path(filename))
+                    except FileNotFoundError:
+                        pass
+                elif isinstance(data, bytes):
+                    atomic_write(self.path(filename), data)
+                else:
+                    atomic_write_json(self.path(filename), data)
+            except (OSError, TypeError, ValueError) as e:
+                self.errors.append((filename, e))
+                print(f"警告：保存 {filename} 失败: {e}")
+            finally:
+                with self._cond:
+                    self._current = None
+                    self._cond.notify_all()
+
+
+class MemoryStore:
+    """ 与 ScoreStore 接口相同但只存在内存里，不读写用户数据目录，也没有后台线程
+
+    离线渲染等只借用 Game 绘制画面的场合使用，避免读到本机的分数或改动数据目录。
+    """
+
+    def __init__(self, data_dir=''):
+        self.data_dir = data_dir
+        self.errors = []
+        self._files = {}
+
+    @classmethod
+    def preload(cls, data_dir, filenames):
+        """ 从数据目录读入指定文件（如字体缓存）的副本，之后的保存只留在内存里，不写回磁盘 """
+        store = cls(data_dir)
+        for filename in filenames:
+            try:
+                with open(store.path(filename), 'r') as f:
+                    store._files[filename] = json.load(f)
+            except (OSError, ValueError):
+                continue
+        return store
+
+    def path(self, filename):
+        return os.path.join(self.data_dir, filename)
+
+    def load(self, filename, default=None):
+        return self._files.get(filename, default)
+
+    def save(self, filename, data):
+        self._files[filename] = data
+
+    def remove(self, filename):
+        self._files.pop(filename, None)
+
+    def set_aside(self, filename):
+        return None
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
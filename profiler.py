@@ -0,0 +1,182 @@
+import time
+
+# 分阶段帧计时：主循环在每个阶段结束时调用 record()，数据写入固定大小的环形缓冲，
+# 可以随时算出最近若干帧的 p50/p99，也可以导出为 CSV 或 Chrome trace（chrome://tracing、Perfetto）
+
+FRAME_HISTORY = 1024  # 保留最近多少帧
+SPAN_HISTORY = FRAME_HISTORY * 16  # 保留最近多少个阶段记录
+LATENCY_HISTORY = 4096  # 保留最近多少次输入延迟
+LATENCY_BUCKET_MS = 5  # 延迟分布直方图的桶宽
+
+
+class FrameProfiler:
+    """ 帧和阶段耗时的环形缓冲，时间单位为秒（perf_counter） """
+
+    def __init__(self, frames=FRAME_HISTORY, spans=SPAN_HISTORY, clock=time.perf_counter):
+        self.now = clock
+        self.enabled = True
+        # 帧：开始时间、耗时
+        self.frame_start = [0.0] * frames
+        self.frame_time = [0.0] * frames
+        self.frame_count = 0
+        # 阶段：阶段编号、所属帧号、开始时间、耗时
+        self.span_phase = [0] * spans
+        self.span_frame = [0] * spans
+        self.span_start = [0.0] * spans
+        self.span_time = [0.0] * spans
+        self.span_count = 0
+        self.phases = []  # 阶段名，按首次出现的顺序编号
+        self._phase_ids = {}
+        self._frame_begin = None
+
+    def begin_frame(self):
+        self._frame_begin = self.now()
+        return self._frame_begin
+
+    def end_frame(self):
+        if self._frame_begin is None:
+            return
+        i = self.frame_count % len(self.frame_time)
+        self.frame_start[i] = self._frame_begin
+        self.frame_time[i] = self.now() - self._frame_begin
+        self.frame_count += 1
+        self._frame_begin = None
+
+    def record(self, phase, start):
+        """ 记录从 start 到现在的一个阶段，返回现在的时间，便于接着计下一个阶段 """
+        now = self.now()
+        if not self.enabled:
+            return now
+        phase_id = self._phase_ids.get(phase)
+        if phase_id is None:
+            phase_id = self._phase_ids[phase] = len(self.phases)
+            self.phases.append(phase)
+        i = self.span_count % len(self.span_time)
+        self.span_phase[i] = phase_id
+        self.span_frame[i] = self.frame_count
+        self.span_start[i] = start
+        self.span_time[i] = now - start
+        self.span_count += 1
+        return now
+
+    def frames(self):
+        """ 缓冲中的帧，按时间顺序返回 [(帧号, 开始时间, 耗时), ...] """
+        size = len(self.frame_time)
+        first = max(0, self.frame_count - size)
+        return [(n, self.frame_start[n % size], self.frame_time[n % size])
+                for n in range(first, self.frame_count)]
+
+    def spans(self):
+        """ 缓冲中的阶段记录，按时间顺序返回 [(阶段名, 帧号, 开始时间, 耗时), ...] """
+        size = len(self.span_time)
+        first = max(0, self.span_count - size)
+        return [(self.phases[self.span_phase[n % size]], self.span_frame[n % size],
+                 self.span_start[n % size], self.span_time[n % size])
+                for n in range(first, self.span_count)]
+
+    def stats(self):
+        """ 最近若干帧的 (p50 毫秒, p99 毫秒, FPS)，没有数据时返回 None """
+        frames = self.frames()
+        if len(frames) < 2:
+            return None
+        times = sorted(t for _, _, t in frames)
+        p50 = times[len(times) // 2] * 1000
+        p99 = times[min(int(len(times) * 0.99), len(times) - 1)] * 1000
+        span = frames[-1][1] + frames[-1][2] - frames[0][1]
+        fps = len(frames) / span if span > 0 else 0.0
+        return p50, p99, fps
+
+    def phase_stats(self):
+        """ 每个阶段的 (次数, p50 毫秒, p99 毫秒) """
+        by_phase = {}
+        for phase, _, _, duration in self.spans():
+            by_phase.setdefault(phase, []).append(duration)
+        result = {}
+        for phase, times in by_phase.items():
+            times.sort()
+            result[phase] = (len(times), times[len(times) // 2] * 1000,
+                             times[min(int(len(times) * 0.99), len(times) - 1)] * 1000)
+        return result
+
+    def to_csv(self):
+        lines = ['kind,name,frame,start_ms,duration_ms']
+        for n, start, duration in self.frames():
+            lines.append(f'frame,frame,{n},{start * 1000:.4f},{duration * 1000:.4f}')
+        for phase, n, start, duration in self.spans():
+            lines.append(f'phase,{phase},{n},{start * 1000:.4f},{duration * 1000:.4f}')
+        return '\n'.join(lines) + '\n'
+
+    def to_trace(self):
+        """ Chrome trace-event 格式：帧和阶段都是完整事件（ph=X），时间单位为微秒 """
+        events = [{'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': tid, 'args': {'name': name}}
+                  for tid, name in ((1, 'frames'), (2, 'phases'))]
+        events.extend({'name': 'frame', 'cat': 'frame', 'ph': 'X', 'pid': 1, 'tid': 1,
+                       'ts': start * 1e6, 'dur': duration * 1e6, 'args': {'frame': n}}
+                      for n, start, duration in self.frames())
+        events.extend({'name': phase, 'cat': 'phase', 'ph': 'X', 'pid': 1, 'tid': 2,
+                       'ts': start * 1e6, 'dur': duration * 1e6, 'args': {'frame': n}}
+                      for phase, n, start, duration in self.spans())
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+class LatencyProbe:
+    """ 输入到显示的延迟：从按键的时间戳到该输入生效后第一次提交画面，单位为秒 """
+
+    def __init__(self, size=LATENCY_HISTORY, clock=time.perf_counter):
+        self.now = clock
+        self.samples = [0.0] * size
+        self.count = 0
+        self._pending = []  # 已在逻辑帧中生效、还没显示出来的输入的时间戳
+
+    def applied(self, stamp):
+        self._pending.append(stamp)
+
+    def displayed(self):
+        """ 画面提交后调用，结算之前生效的输入 """
+        if not self._pending:
+            return
+        now = self.now()
+        size = len(self.samples)
+        for stamp in self._pending:
+            self.samples[self.count % size] = now - stamp
+            self.count += 1
+        self._pending.clear()
+
+    def discard(self):
+        # 状态切换等情况下生效的输入不会再被显示，不计入统计
+        self._pending.clear()
+
+    def values(self):
+        return self.samples[:self.count] if self.count < len(self.samples) else list(self.samples)
+
+    def stats(self):
+        """ (次数, p50 毫秒, p90 毫秒, p99 毫秒, 最大毫秒)，没有数据时返回 None """
+        times = sorted(self.values())
+        if not times:
+            return None
+        n = len(times)
+        return (self.count, times[n // 2] * 1000, times[min(int(n * 0.9), n - 1)] * 1000,
+                times[min(int(n * 0.99), n - 1)] * 1000, times[-1] * 1000)
+
+    def histogram(self, bucket_ms=LATENCY_BUCKET_MS):
+        """ [(桶下限毫秒, 次数), ...]，只含非空的桶 """
+        buckets = {}
+        for t in self.values():
+            key = int(t * 1000 // bucket_ms) * bucket_ms
+            buckets[key] = buckets.get(key, 0) + 1
+        return sorted(buckets.items())
+
+    def report(self, bucket_ms=LATENCY_BUCKET_MS):
+        stats = self.stats()
+        if stats is None:
+            return '输入延迟：暂无数据'
+        count, p50, p90, p99, worst = stats
+        histogram = self.histogram(bucket_ms)
+        peak = max(n for _, n in histogram)
+        lines = [f'输入延迟（{count} 次）：p50 {p50:.1f}ms p90 {p90:.1f}ms p99 {p99:.1f}ms 最大 {worst:.1f}ms']
+        for low, n in histogram:
+            lines.append(f'{low:5d}-{low + bucket_ms:<5d}ms {n:6d} {"#" * max(1, n * 40 // peak)}')
+        return '\n'.join(lines)
+
+    def to_csv(self):
+        return 'latency_ms\n' + ''.join(f'{t * 1000:.4f}\n' for t in self.values())
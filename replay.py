@@ -0,0 +1,309 @@
+import argparse
+import json
+import os
+import random
+import struct
+import sys
+import zlib
+
+from leaderboard import Leaderboard
+from snake_core import DIRECTIONS, DEAD, WIN, SnakeEngine
+
+# 回放文件：同样的种子加同样的输入序列，规则引擎必然得到同样的一局
+#
+#   文件头  MAGIC、版本、棋盘宽高、初始速度、随机种子
+#   输入    变长整数个数，之后每条为变长整数 (距上一条输入的逻辑帧数 << 2) | 方向编号
+#   关键帧  变长整数个数，之后每个为 逻辑帧、已生效输入条数、压缩状态长度、压缩状态
+#   文件尾  最终逻辑帧数、最终分数、结局
+#
+# 输入在第 tick 帧之前生效，即引擎 ticks == tick 时调用 handle_input 再 step。
+# 关键帧让播放器可以跳到任意位置，不必从第 0 帧重放。
+
+MAGIC = b'SNKR'
+VERSION = 1
+KEYFRAME_INTERVAL = 1024  # 每隔多少逻辑帧存一个关键帧
+HEADER = struct.Struct('<4sBHHBQ')
+FOOTER = struct.Struct('<IIB')
+
+# 结局编码
+RESULT_DEAD = 0
+RESULT_WIN = 1
+RESULT_UNFINISHED = 2
+
+
+class ReplayError(ValueError):
+    """ 回放文件格式错误 """
+
+
+def write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, pos):
+    """ 返回 (值, 新位置) """
+    value = 0
+    shift = 0
+    while True:
+        if pos >= len(data):
+            raise ReplayError('变长整数被截断')
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _pack_state(state):
+    state = dict(state)
+    version, internal, gauss = state['rng']
+    state['rng'] = [version, list(internal), gauss]
+    return zlib.compress(json.dumps(state, separators=(',', ':')).encode('ascii'))
+
+
+def _unpack_state(blob):
+    state = json.loads(zlib.decompress(blob))
+    version, internal, gauss = state['rng']
+    state['rng'] = (version, tuple(internal), gauss)
+    return state
+
+
+class Replay:
+    """ 一局的完整记录：开局参数、输入序列和关键帧 """
+
+    def __init__(self, width, height, speed, seed, inputs=None, keyframes=None,
+                 final_ticks=0, final_score=0, result=RESULT_UNFINISHED):
+        self.width = width
+        self.height = height
+        self.speed = speed
+        self.seed = seed
+        self.inputs = inputs if inputs is not None else []  # [(逻辑帧, 方向编号), ...]
+        self.keyframes = keyframes if keyframes is not None else []  # [(逻辑帧, 输入条数, 压缩状态), ...]
+        self.final_ticks = final_ticks
+        self.final_score = final_score
+        self.result = result
+
+    def to_bytes(self):
+        out = bytearray(HEADER.pack(MAGIC, VERSION, self.width, self.height, self.speed, self.seed))
+        write_varint(out, len(self.inputs))
+        last = 0
+        for tick, direction in self.inputs:
+            write_varint(out, ((tick - last) << 2) | direction)
+            last = tick
+        write_varint(out, len(self.keyframes))
+        for tick, index, blob in self.keyframes:
+            write_varint(out, tick)
+            write_varint(out, index)
+            write_varint(out, len(blob))
+            out += blob
+        out += FOOTER.pack(self.final_ticks, self.final_score, self.result)
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data):
+        if len(data) < HEADER.size + FOOTER.size:
+            raise ReplayError('文件过短')
+        magic, version, width, height, speed, seed = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ReplayError('不是回放文件')
+        if version != VERSION:
+            raise ReplayError(f'不支持的回放版本: {version}')
+        pos = HEADER.size
+        count, pos = read_varint(data, pos)
+        inputs = []
+        tick = 0
+        for _ in range(count):
+            value, pos = read_varint(data, pos)
+            tick += value >> 2
+            inputs.append((tick, value & 3))
+        count, pos = read_varint(data, pos)
+        keyframes = []
+        for _ in range(count):
+            tick, pos = read_varint(data, pos)
+            index, pos = read_varint(data, pos)
+            size, pos = read_varint(data, pos)
+            keyframes.append((tick, index, bytes(data[pos:pos + size])))
+            pos += size
+        if len(data) - pos != FOOTER.size:
+            raise ReplayError('文件尾长度不符')
+        final_ticks, final_score, result = FOOTER.unpack_from(data, pos)
+        return cls(width, height, speed, seed, inputs, keyframes, final_ticks, final_score, result)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+
+class ReplayRecorder:
+    """ 包装规则引擎：开局时选定种子，记录每次方向输入并定期存关键帧 """
+
+    def __init__(self, engine, keyframe_interval=KEYFRAME_INTERVAL):
+        self.engine = engine
+        self.keyframe_interval = keyframe_interval
+        self.replay = None
+
+    def start(self, speed=None, seed=None):
+        """ 开始新的一局；不给种子时随机选一个 """
+        if seed is None:
+            seed = random.getrandbits(63)
+        engine = self.engine
+        engine.reset(speed, seed)
+        self.replay = Replay(engine.width, engine.height, engine.start_speed, seed)
+
+    def handle_input(self, direction):
+        # 原样记录按键，被 handle_input 忽略的输入在回放时同样会被忽略
+        self.replay.inputs.append((self.engine.ticks, DIRECTIONS.index(direction)))
+        self.engine.snake.handle_input(direction)
+
+    def step(self):
+        engine = self.engine
+        event, score = engine.step()
+        replay = self.replay
+        replay.final_ticks = engine.ticks
+        replay.final_score = score
+        if event == DEAD:
+            replay.result = RESULT_DEAD
+        elif event == WIN:
+            replay.result = RESULT_WIN
+        elif engine.ticks % self.keyframe_interval == 0:
+            replay.keyframes.append((engine.ticks, len(replay.inputs), _pack_state(engine.get_state())))
+        return event, score
+
+    def to_bytes(self):
+        return self.replay.to_bytes()
+
+
+class ReplayPlayer:
+    """ 按回放重跑一局；seek() 借助关键帧跳到任意逻辑帧 """
+
+    def __init__(self, replay):
+        self.replay = replay
+        self.engine = SnakeEngine(replay.speed, replay.width, replay.height, random.Random())
+        self.rewind()
+
+    def rewind(self):
+        self.engine.reset(self.replay.speed, self.replay.seed)
+        self.input_index = 0
+
+    @property
+    def ticks(self):
+        return self.engine.ticks
+
+    def step(self):
+        engine = self.engine
+        inputs = self.replay.inputs
+        i = self.input_index
+        while i < len(inputs) and inputs[i][0] == engine.ticks:
+            engine.snake.handle_input(DIRECTIONS[inputs[i][1]])
+            i += 1
+        self.input_index = i
+        return engine.step()
+
+    def seek(self, tick):
+        """ 跳到第 tick 个逻辑帧之后的状态 """
+        engine = self.engine
+        if tick < engine.ticks:
+            self.rewind()
+        for kf_tick, index, blob in reversed(self.replay.keyframes):
+            if engine.ticks < kf_tick <= tick:
+                engine.set_state(_unpack_state(blob))
+                self.input_index = index
+                break
+        while engine.ticks < tick and engine.alive:
+            self.step()
+
+    def run(self):
+        """ 全速跑到本局结束（或记录的最终帧），返回 (事件, 分数) """
+        engine = self.engine
+        event, score = None, engine.score
+        limit = self.replay.final_ticks
+        while engine.alive and engine.ticks < limit:
+            event, score = self.step()
+        return event, score
+
+
+def verify(replay, claimed_score=None):
+    """ 重放整局并与记录的结局核对，返回 (是否一致, 说明) """
+    player = ReplayPlayer(replay)
+    event, score = player.run()
+    engine = player.engine
+    if replay.result == RESULT_UNFINISHED:
+        expected = None
+    else:
+        expected = DEAD if replay.result == RESULT_DEAD else WIN
+    if engine.ticks != replay.final_ticks:
+        return False, f'逻辑帧数不符: 重放 {engine.ticks}，记录 {replay.final_ticks}'
+    if expected is not None and event != expected:
+        return False, f'结局不符: 重放 {event}，记录 {expected}'
+    if score != replay.final_score:
+        return False, f'分数不符: 重放 {score}，记录 {replay.final_score}'
+    if claimed_score is not None and score != claimed_score:
+        return False, f'分数不符: 重放 {score}，声称 {claimed_score}'
+    return True, f'通过: {score} 分，{engine.ticks} 帧'
+
+
+def audit(leaderboard_path, replay_dir):
+    """ 逐条核对排行榜，返回未通过的记录数 """
+    with open(leaderboard_path, 'r') as f:
+        entries = json.load(f)
+    if not isinstance(entries, list):
+        print('排行榜格式不对：不是记录列表')
+        return 1
+    failures = 0
+    for entry in entries:
+        # 与 Leaderboard.from_list 相同的校验，坏记录算作未通过，不中断其余核对
+        if not Leaderboard.valid(entry):
+            print(f'{entry!r} -> 记录格式不对')
+            failures += 1
+            continue
+        label = f"{entry['name']} ({entry['speed']}): {entry['score']}"
+        if not entry.get('replay'):
+            print(f'{label} -> 无回放')
+            failures += 1
+            continue
+        try:
+            replay = Replay.load(os.path.join(replay_dir, entry['replay']))
+        except (OSError, ReplayError) as e:
+            print(f'{label} -> 无法读取回放: {e}')
+            failures += 1
+            continue
+        ok, message = verify(replay, entry['score'])
+        if ok and replay.speed != entry['speed']:
+            ok, message = False, f'速度不符: 回放 {replay.speed}'
+        print(f'{label} -> {message}')
+        failures += not ok
+    return failures
+
+
+def main(argv=None):
+    from persistence import user_data_dir
+
+    parser = argparse.ArgumentParser(description='贪吃蛇回放校验')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('verify', help='重放单个回放文件')
+    p.add_argument('file')
+    p.add_argument('--score', type=int, help='需要核对的分数')
+    p = sub.add_parser('audit', help='核对排行榜中每条记录的回放')
+    p.add_argument('leaderboard', nargs='?', help='默认为用户数据目录中的 leaderboard.json')
+    args = parser.parse_args(argv)
+
+    if args.command == 'verify':
+        try:
+            replay = Replay.load(args.file)
+        except (OSError, ReplayError) as e:
+            print(f'无法读取回放: {e}')
+            return 2
+        ok, message = verify(replay, args.score)
+        print(message)
+        return 0 if ok else 1
+
+    path = args.leaderboard or os.path.join(user_data_dir(), 'leaderboard.json')
+    return 1 if audit(path, os.path.dirname(path) or '.') else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
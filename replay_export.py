@@ -0,0 +1,264 @@
+import argparse
+import json
+import multiprocessing
+import os
+import shlex
+import shutil
+import signal
+import subprocess
+import sys
+import time
+from collections import deque
+
+# 无窗口渲染：必须在导入 pygame 之前设置
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')  # 原始流可能写到标准输出，不能混进欢迎信息
+
+import pygame  # noqa: E402
+
+import snake_game  # noqa: E402
+from persistence import MemoryStore, user_data_dir  # noqa: E402
+from replay import Replay, ReplayPlayer  # noqa: E402
+from snake_core import WINDOW_WIDTH, WINDOW_HEIGHT, GRID_SIZE, GRID_WIDTH, GRID_HEIGHT  # noqa: E402
+from snake_game import DARK_THEME, LIGHT_THEME, FONT_CACHE_FILE, Camera, Game  # noqa: E402
+
+# 回放导出：把回放离线渲染成图片序列或原始视频流，画面与游戏内完全相同
+#
+#   python replay_export.py run.snkr --output frames/            # frame_000000.png ...
+#   python replay_export.py run.snkr --raw - --size 1280x720 | ffmpeg -f rawvideo -pix_fmt rgb24 ...
+#   python replay_export.py --rank 1 --pipe "ffmpeg -y -f rawvideo -pix_fmt rgb24 -s 1280x720 -r 30 -i - top1.mp4"
+#
+# 其他分辨率下不缩放成品画面，而是按比例放大格子边长直接在目标分辨率上绘制，视口仍是窗口的格数；
+# 格子边长取整数，比例与窗口不同或除不尽时四周留出背景色。
+#
+# 主进程先不绘制地快速重放一遍，按视频帧率算出每个视频帧显示哪个逻辑帧、视口在哪里（视口跟随有死区，
+# 取决于之前的轨迹，必须顺序算出），再把视频帧按块分给工作进程。工作进程借助回放关键帧跳到块的起点，
+# 各自绘制；图片直接写盘，原始流按块顺序写出，同时在途的块数有上限，内存占用与总帧数无关。
+
+DEFAULT_FPS = 30
+CHUNK_FRAMES = 32  # 每块视频帧数
+HOLD_SECONDS = 1.0  # 结尾停留的秒数
+FRAME_PATTERN = 'frame_{:06d}.png'
+
+
+def parse_size(text):
+    """ 解析 --size 参数，如 1280x720 """
+    try:
+        width, height = (int(v) for v in text.lower().split('x'))
+    except ValueError:
+        width = height = 0
+    if width <= 0 or height <= 0:
+        raise argparse.ArgumentTypeError(f'无效的分辨率: {text}')
+    if width < GRID_WIDTH or height < GRID_HEIGHT:
+        raise argparse.ArgumentTypeError(f'分辨率至少为 {GRID_WIDTH}x{GRID_HEIGHT}（每格一个像素）: {text}')
+    return width, height
+
+
+def cell_size(size):
+    """ 目标分辨率下的格子边长：按窗口比例放大后取整，视口整体放得下 """
+    return max(1, int(GRID_SIZE * min(size[0] / WINDOW_WIDTH, size[1] / WINDOW_HEIGHT)))
+
+
+def timeline(replay, fps=DEFAULT_FPS, speedup=1.0, start=0, end=None, hold=HOLD_SECONDS):
+    """ 顺序重放一遍，返回每个视频帧的 (逻辑帧, 视口x, 视口y)
+
+    逻辑帧按当时蛇的速度推进（与游戏内节奏一致），视频帧按固定帧率采样，
+    每个视频帧显示在它之前最后完成的逻辑帧。
+    """
+    player = ReplayPlayer(replay)
+    engine = player.engine
+    camera = Camera(engine.board)
+    camera.center(engine.snake.body[0])
+    end = replay.final_ticks if end is None else min(end, replay.final_ticks)
+    interval = speedup / fps  # 相邻视频帧之间的游戏时间（秒）
+    frames = []
+    now = 0.0  # 当前逻辑帧的游戏时间
+    next_frame = None
+    while True:
+        tick = engine.ticks
+        after = now + 1.0 / engine.snake.speed
+        if tick >= start:
+            if next_frame is None:
+                next_frame = now
+            while next_frame < after:
+                frames.append((tick, camera.x, camera.y))
+                next_frame += interval
+        if tick >= end or not engine.alive:
+            break
+        player.step()
+        camera.follow(engine.snake.body[0])
+        now = after
+    if frames:
+        frames.extend([frames[-1]] * int(hold * fps))
+    return frames
+
+
+def chunks(frames, size=CHUNK_FRAMES):
+    return [(i, frames[i:i + size]) for i in range(0, len(frames), size)]
+
+
+class FrameRenderer:
+    """ 工作进程内的渲染器：自己的 Game、回放播放器和视口，按块绘制视频帧 """
+
+    def __init__(self, replay, size, theme, output_dir=None):
+        snake_game.init_display(size)
+        # 只读入本机的字体缓存，不读分数和排行榜，也不写数据目录；分数栏的最高分显示这局回放的最终得分
+        self.game = Game(MemoryStore.preload(user_data_dir(), [FONT_CACHE_FILE]), cell_size(size))
+        self.game.high_score = replay.final_score
+        self.game.set_theme(theme)
+        self.player = ReplayPlayer(replay)
+        self.camera = Camera(self.player.engine.board)
+        self.size = size
+        self.output_dir = output_dir
+
+    def draw(self, tick, x, y):
+        player = self.player
+        if tick < player.ticks:
+            player.seek(tick)
+        elif tick > player.ticks:
+            # 同一块内的后续帧离得很近，逐帧推进比查关键帧快
+            if tick - player.ticks > CHUNK_FRAMES:
+                player.seek(tick)
+            while player.ticks < tick:
+                player.step()
+        engine = player.engine
+        self.camera.x, self.camera.y = x, y
+        self.game.draw_playing(engine.snake, engine.food, self.camera)
+        return snake_game.screen
+
+    def render(self, task):
+        """ 绘制一块视频帧：写图片时返回帧数，否则返回这一块的 RGB 字节 """
+        first, frames = task
+        out = []
+        last_key = None
+        last_path = None
+        for n, key in enumerate(frames, first):
+            if self.output_dir is not None:
+                path = os.path.join(self.output_dir, FRAME_PATTERN.format(n))
+                if key == last_key:
+                    shutil.copyfile(last_path, path)  # 逻辑帧没变（低速或结尾停留），不必重新编码
+                else:
+                    pygame.image.save(self.draw(*key), path)
+                last_path = path
+            else:
+                out.append(out[-1] if key == last_key else pygame.image.tostring(self.draw(*key), 'RGB'))
+            last_key = key
+        return len(frames) if self.output_dir is not None else b''.join(out)
+
+
+_renderer = None
+
+
+def _init_worker(data, size, theme_name, output_dir):
+    global _renderer
+    theme = LIGHT_THEME if theme_name == 'light' else DARK_THEME
+    _renderer = FrameRenderer(Replay.from_bytes(data), size, theme, output_dir)
+    # SDL 初始化时接管了 SIGTERM，恢复默认处理，否则进程池结束时 terminate() 杀不掉工作进程
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+
+def _render_chunk(task):
+    return _renderer.render(task)
+
+
+def export(replay, frames, sink, size, theme='dark', output_dir=None, workers=None, chunk_size=CHUNK_FRAMES,
+           progress=sys.stderr):
+    """ 并行渲染 frames；sink 为写原始流的函数（写图片时为 None），返回渲染的视频帧数 """
+    tasks = chunks(frames, chunk_size)
+    workers = workers or os.cpu_count() or 1
+    window = workers * 2  # 同时在途的块数上限，原始流按顺序写出时内存有界
+    done = 0
+    start = time.perf_counter()
+    with multiprocessing.Pool(workers, _init_worker, (replay.to_bytes(), size, theme, output_dir)) as pool:
+        pending = deque()
+        for task in tasks + [None] * window:
+            if task is not None:
+                pending.append(pool.apply_async(_render_chunk, (task,)))
+            if pending and (task is None or len(pending) >= window):
+                result = pending.popleft().get()
+                if sink is not None:
+                    sink(result)
+                done += result if output_dir is not None else len(result) // (size[0] * size[1] * 3)
+                elapsed = time.perf_counter() - start
+                print(f'\r{done}/{len(frames)} 帧，{done / elapsed:.0f} 帧/秒', end='', file=progress, flush=True)
+    print(file=progress)
+    return done
+
+
+def leaderboard_replay(rank):
+    """ 排行榜第 rank 名（从 1 开始）的回放路径 """
+    path = os.path.join(user_data_dir(), 'leaderboard.json')
+    with open(path, 'r') as f:
+        entries = sorted(json.load(f), key=lambda e: e['score'], reverse=True)
+    if not 1 <= rank <= len(entries):
+        raise ValueError(f'排行榜只有 {len(entries)} 条记录')
+    entry = entries[rank - 1]
+    if not entry.get('replay'):
+        raise ValueError(f"第 {rank} 名 {entry['name']} 没有回放")
+    return os.path.join(os.path.dirname(path), entry['replay'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='把回放渲染成图片序列或原始视频流')
+    parser.add_argument('replay', nargs='?', help='回放文件')
+    parser.add_argument('--rank', type=int, help='改为导出排行榜第几名的回放')
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--output', metavar='DIR', help='把每一帧存成 PNG 写入该目录')
+    target.add_argument('--raw', metavar='FILE', help='把 RGB24 原始帧写入文件，- 为标准输出')
+    target.add_argument('--pipe', metavar='COMMAND', help='把 RGB24 原始帧写入该命令的标准输入，如 ffmpeg')
+    parser.add_argument('--size', type=parse_size, default=(WINDOW_WIDTH, WINDOW_HEIGHT), metavar='宽x高',
+                        help=f'输出分辨率，默认 {WINDOW_WIDTH}x{WINDOW_HEIGHT}；按比例放大格子直接绘制，比例不同时四周留边')
+    parser.add_argument('--fps', type=int, default=DEFAULT_FPS)
+    parser.add_argument('--speedup', type=float, default=1.0, help='播放倍速')
+    parser.add_argument('--start', type=int, default=0, help='从第几个逻辑帧开始')
+    parser.add_argument('--end', type=int, default=None, help='到第几个逻辑帧结束')
+    parser.add_argument('--hold', type=float, default=HOLD_SECONDS, help='结尾画面停留的秒数')
+    parser.add_argument('--theme', choices=('dark', 'light'), default='dark')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_FRAMES, help='每次分给工作进程的视频帧数')
+    args = parser.parse_args(argv)
+
+    if (args.replay is None) == (args.rank is None):
+        parser.error('需要给出回放文件或 --rank 之一')
+    try:
+        path = args.replay or leaderboard_replay(args.rank)
+        replay = Replay.load(path)
+    except (OSError, ValueError) as e:  # ReplayError 是 ValueError 的子类
+        print(f'无法读取回放: {e}', file=sys.stderr)
+        return 2
+
+    frames = timeline(replay, args.fps, args.speedup, args.start, args.end, args.hold)
+    width, height = args.size
+    print(f'{path}: {replay.final_score} 分，逻辑帧 {args.start}..{frames[-1][0] if frames else args.start}，'
+          f'{len(frames)} 个视频帧（{width}x{height} {args.fps} 帧/秒）', file=sys.stderr)
+
+    process = None
+    out = None
+    sink = None
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+    elif args.pipe:
+        process = subprocess.Popen(shlex.split(args.pipe), stdin=subprocess.PIPE)
+        sink = process.stdin.write
+    elif args.raw == '-':
+        sink = sys.stdout.buffer.write
+    else:
+        out = open(args.raw, 'wb')
+        sink = out.write
+    try:
+        export(replay, frames, sink, args.size, args.theme, args.output, args.workers, args.chunk_size)
+    finally:
+        if out is not None:
+            out.close()
+        if process is not None:
+            process.stdin.close()
+            process.wait()
+    if not args.output:
+        print(f'编码示例: ffmpeg -f rawvideo -pix_fmt rgb24 -s {width}x{height} -r {args.fps} -i <原始流> out.mp4',
+              file=sys.stderr)
+    return 0 if process is None or process.returncode == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
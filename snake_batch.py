@@ -0,0 +1,259 @@
+import random
+
+import numpy as np
+
+from snake_core import (
+    GRID_WIDTH, GRID_HEIGHT, DEFAULT_SPEED, DIRECTIONS, DENSE_BOARD_LIMIT,
+    SPEED_CAP, SPEED_STEP, SPEED_UP_EVERY, OBSTACLE_COUNT, CELL_EMPTY, CELL_SNAKE, CELL_OBSTACLE, CELL_FOOD,
+    MOVE, EAT, DEAD, WIN, check_board_size
+)
+
+# 批量环境：N 局游戏以稠密数组保存，一次向量化调用让所有局同时前进一个逻辑帧
+# 规则与 snake_core.SnakeEngine 完全一致，同样的种子得到逐位相同的结果
+
+# 事件编码，与 snake_core 的事件字符串一一对应
+EVENT_MOVE = 0
+EVENT_EAT = 1
+EVENT_DEAD = 2
+EVENT_WIN = 3
+EVENT_NAMES = (MOVE, EAT, DEAD, WIN)
+
+# 动作编码：-1 表示不转向，0..3 对应 DIRECTIONS 中的方向
+NO_ACTION = -1
+
+
+def _turn_table():
+    # turn[d * 5 + a + 1]：当前方向 d 收到动作 a 后的新方向，与 Snake.handle_input 相同，忽略反向和重复方向
+    table = np.zeros((len(DIRECTIONS), len(DIRECTIONS) + 1), dtype=np.int64)
+    for d, (dx, dy) in enumerate(DIRECTIONS):
+        table[d, 0] = d
+        for a, direction in enumerate(DIRECTIONS):
+            table[d, a + 1] = d if direction in ((dx, dy), (-dx, -dy)) else a
+    return table.reshape(-1)
+
+
+def _neighbor_table(width, height):
+    # nxt[d * cells + c]：格子 c 沿方向 d 前进一格（环绕）后的格子
+    cells = np.arange(width * height, dtype=np.int64)
+    x, y = cells % width, cells // width
+    return np.concatenate([((y + dy) % height) * width + (x + dx) % width for dx, dy in DIRECTIONS])
+
+
+def _randbelow(rng, n):
+    # 与 Random.randrange(n) 消耗同样的随机数：取 n 的位数那么多随机位，超出 n 时重抽；
+    # 直接调用 getrandbits 省去 randrange 的参数检查和两层函数调用
+    k = n.bit_length()
+    r = rng.getrandbits(k)
+    while r >= n:
+        r = rng.getrandbits(k)
+    return r
+
+
+class BatchSnakeEnv:
+    """ N 局游戏的向量化环境，step(actions) 返回 (事件数组, 分数数组) """
+
+    def __init__(self, num_envs, speed=DEFAULT_SPEED, width=GRID_WIDTH, height=GRID_HEIGHT, seeds=None):
+        check_board_size(width, height)
+        # 更大的棋盘在标量引擎里是 SparseBoard，随机取空格的方式不同，无法逐位一致
+        if width * height > DENSE_BOARD_LIMIT:
+            raise ValueError(f'批量环境只支持不超过 {DENSE_BOARD_LIMIT} 格的棋盘: {width}x{height}')
+        self.num_envs = num_envs
+        self.width = width
+        self.height = height
+        self.cells = width * height
+        # 环形缓冲容量：插入新头后、弹出旧尾前最多比蛇长多一格
+        self.capacity = self.cells + 1
+        if seeds is None:
+            seeds = [random.randrange(2 ** 63) for _ in range(num_envs)]
+        # 每局一个独立的随机数源，调用顺序与 SnakeEngine 相同，保证随机数序列一致
+        self._rngs = [random.Random(seed) for seed in seeds]
+        self.start_speed = np.full(num_envs, speed, dtype=np.int64)
+        self._turn = _turn_table()
+        self._next = _neighbor_table(width, height)
+
+        n = num_envs
+        # 占用网格末尾多留一个暂存格，不需要写入的局把写操作重定向到这里，避免按掩码取子集
+        self._occ = np.zeros(n * self.cells + 1, dtype=np.uint8)
+        self._scratch = n * self.cells
+        self.occupancy = self._occ[:-1].reshape(n, height, width)
+        # 空格索引，与 Board.free / Board.slot 逐位一致，共用同一个暂存下标。格子编号全部用同一种窄整数保存，
+        # 散写时值与目标数组类型相同，不必逐元素转换；全局下标由 int64 基址相加得到，是花式索引原生的类型
+        index_type = np.int16 if self.capacity <= np.iinfo(np.int16).max else np.int32
+        self._free = np.zeros(n * self.cells + 1, dtype=index_type)
+        self._slot = np.zeros(n * self.cells + 1, dtype=index_type)
+        self.free_count = np.zeros(n, dtype=index_type)
+        self.body = np.zeros((n, self.capacity), dtype=index_type)
+        self._body = self.body.reshape(-1)
+        self.head_index = np.zeros(n, dtype=np.int64)  # 蛇头在环形缓冲中的下标
+        self.tail_index = np.zeros(n, dtype=np.int64)  # 蛇尾在环形缓冲中的下标
+        self.body_size = np.zeros(n, dtype=np.int64)
+        self.head = np.zeros(n, dtype=index_type)  # 蛇头格子
+        self.neck = np.zeros(n, dtype=index_type)  # 紧挨蛇头的一节，长度为1时为 -1
+        self.length = np.zeros(n, dtype=np.int64)
+        self.direction = np.zeros(n, dtype=np.int64)
+        self.food = np.zeros(n, dtype=index_type)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.speed = np.zeros(n, dtype=np.int64)
+        self.ticks = np.zeros(n, dtype=np.int64)
+        self.alive = np.zeros(n, dtype=bool)
+        self._cell_base = np.arange(n, dtype=np.int64) * self.cells
+        self._body_base = np.arange(n, dtype=np.int64) * self.capacity
+
+        # 清空并放下蛇头后的棋盘对每局都相同，只需构造一次模板（等价于 Board.clear + Snake.reset 的 occupy）
+        total = self.cells
+        center = (height // 2) * width + width // 2
+        self._center = center
+        free = np.arange(total, dtype=index_type)
+        slot = np.arange(total, dtype=index_type)
+        free[center] = total - 1
+        slot[total - 1] = center
+        slot[center] = -1
+        self._template_free = free
+        self._template_slot = slot
+        self._template_occ = np.zeros(total, dtype=np.uint8)
+        self._template_occ[center] = CELL_SNAKE
+        # SnakeEngine 构造时先按默认布局摆一次蛇和食物再 reset()，这里消耗同样的两次随机数
+        for rng in self._rngs:
+            _randbelow(rng, len(DIRECTIONS))
+            _randbelow(rng, total - 1)
+        self.reset()
+
+    def reset(self, indices=None, speed=None):
+        """ 重开指定的局（默认全部），布局与 SnakeEngine.reset() 逐位一致 """
+        rows = np.arange(self.num_envs) if indices is None else np.atleast_1d(indices).astype(np.int64)
+        if speed is not None:
+            self.start_speed[rows] = speed
+        total = self.cells
+        # 只有随机数在 Python 中逐局抽取：方向（与 rng.choice(DIRECTIONS) 相同）、食物和障碍物各自的 randrange
+        takes = OBSTACLE_COUNT + 1
+        bounds = [len(DIRECTIONS)] + [total - 1 - t for t in range(takes)]
+        rngs = self._rngs
+        draws = np.array([[_randbelow(rngs[i], b) for b in bounds] for i in rows.tolist()],
+                         dtype=np.int64).reshape(len(rows), takes + 1)
+
+        occ = self._occ[:-1].reshape(self.num_envs, total)
+        free = self._free[:-1].reshape(self.num_envs, total)
+        slot = self._slot[:-1].reshape(self.num_envs, total)
+        occ[rows] = self._template_occ
+        free[rows] = self._template_free
+        slot[rows] = self._template_slot
+        # 与 Board.take_random 相同的交换删除，所有局同时进行；第一次放食物，其余放障碍物
+        base = rows * total
+        draws[:, 1:] += base[:, None]  # 换成扁平数组中的下标
+        for t in range(takes):
+            k = draws[:, t + 1]
+            cell = self._free[k]
+            last = self._free[base + (total - 2 - t)]
+            self._free[k] = last
+            self._slot[base + last] = k - base
+            self._slot[base + cell] = -1
+            self._occ[base + cell] = CELL_FOOD if t == 0 else CELL_OBSTACLE
+            if t == 0:
+                self.food[rows] = cell
+        self.free_count[rows] = total - 1 - takes
+
+        self.body[rows, 0] = self._center
+        self.tail_index[rows] = 0
+        self.head_index[rows] = 0
+        self.body_size[rows] = 1
+        self.head[rows] = self._center
+        self.neck[rows] = -1
+        self.length[rows] = 1
+        self.direction[rows] = draws[:, 0]
+        self.score[rows] = 0
+        self.speed[rows] = self.start_speed[rows]
+        self.ticks[rows] = 0
+        self.alive[rows] = True
+
+    def positions(self, i):
+        """ 返回第 i 局蛇身坐标列表（头在前），与 Snake.positions 格式一致 """
+        w = self.width
+        idx = (self.head_index[i] - np.arange(self.body_size[i])) % self.capacity
+        return [(int(c) % w, int(c) // w) for c in self.body[i, idx]]
+
+    def step(self, actions=None):
+        """ 所有存活的局前进一个逻辑帧，actions 为长度 N 的方向编码数组 """
+        alive = self.alive
+        if actions is not None:
+            actions = np.asarray(actions)
+            turned = self._turn[self.direction * (len(DIRECTIONS) + 1) + actions + 1]
+            np.copyto(self.direction, turned, where=alive)
+
+        cell_base = self._cell_base
+        scratch = self._scratch
+        new = self._next[self.direction * self.cells + self.head]
+        new_cell = cell_base + new
+        hit = self._occ[new_cell]
+        # 与 new in positions[2:] 等价：蛇身占用但不是紧挨蛇头的那一节
+        dead = (hit == CELL_OBSTACLE) | ((hit == CELL_SNAKE) & (new != self.neck))
+        moving = alive & ~dead
+        self.ticks += alive
+        self.alive = moving
+
+        # 插入新蛇头；未移动的局写回原值，不产生影响
+        np.copyto(self.neck, self.head, where=moving)
+        np.copyto(self.head, new, where=moving)
+        self.head_index += moving
+        self.head_index[self.head_index == self.capacity] = 0
+        self._body[self._body_base + self.head_index] = self.head
+        self._occ[cell_base + self.head] = CELL_SNAKE
+
+        # 与 Board.occupy 相同：新蛇头所在格与空格表末尾交换后删除（食物格不在表中）
+        slot = self._slot[new_cell]
+        take = moving & (slot >= 0)
+        last = self._free[cell_base + self.free_count - 1]
+        self._free[np.where(take, cell_base + slot, scratch)] = last
+        self._slot[np.where(take, cell_base + last, scratch)] = slot
+        # 不必重定向：撞上的格子和食物格本来就不在表中，已死的局在 reset() 时整体重建
+        self._slot[new_cell] = -1
+        self.free_count -= take
+
+        # 超出长度时让出尾部，与 Board.release 相同地追加到空格表末尾
+        size = self.body_size + moving
+        trim = moving & (size > self.length)
+        tail = self._body[self._body_base + self.tail_index]
+        tail_cell = np.where(trim, cell_base + tail, scratch)
+        self._occ[tail_cell] = CELL_EMPTY
+        self._free[np.where(trim, cell_base + self.free_count, scratch)] = tail
+        self._slot[tail_cell] = self.free_count
+        self.free_count += trim
+        self.tail_index += trim
+        self.tail_index[self.tail_index == self.capacity] = 0
+        np.subtract(size, trim, out=self.body_size)
+
+        # 吃到食物：变长、加分、每5分加速并重生食物
+        ate = moving & (new == self.food)
+        events = ate.astype(np.int8)
+        events[~moving] = EVENT_DEAD
+        if ate.any():
+            eaters = np.flatnonzero(ate)
+            self.length[eaters] += 1
+            self.score[eaters] += 1
+            bump = eaters[self.score[eaters] % SPEED_UP_EVERY == 0]
+            self.speed[bump] = np.minimum(self.speed[bump] + SPEED_STEP, SPEED_CAP)
+            self._spawn_food(eaters)
+        events[self.food < 0] = EVENT_WIN
+        return events, self.score
+
+    def _spawn_food(self, rows):
+        # 与 Board.take_random 相同的随机数调用与交换删除；没有空格时本局获胜
+        count = self.free_count[rows]
+        full = count == 0
+        if full.any():
+            self.food[rows[full]] = -1
+            self.alive[rows[full]] = False
+            rows = rows[~full]
+            count = count[~full]
+        if not len(rows):
+            return
+        rngs = self._rngs
+        k = np.array([_randbelow(rngs[i], c) for i, c in zip(rows.tolist(), count.tolist())], dtype=np.int64)
+        base = rows * self.cells
+        cell = self._free[base + k]
+        last = self._free[base + count - 1]
+        self._free[base + k] = last
+        self._slot[base + last] = k
+        self._slot[base + cell] = -1
+        self.free_count[rows] = count - 1
+        self._occ[base + cell] = CELL_FOOD
+        self.food[rows] = cell
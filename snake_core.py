@@ -0,0 +1,564 @@
+import random
+from collections import deque
+
+# 纯规则引擎：不依赖 pygame，也不依赖真实时钟，可在无窗口环境下批量模拟
+
+# 游戏设置
+WINDOW_WIDTH = 800
+WINDOW_HEIGHT = 600
+GRID_SIZE = 20
+GRID_WIDTH = WINDOW_WIDTH // GRID_SIZE
+GRID_HEIGHT = WINDOW_HEIGHT // GRID_SIZE
+
+# 方向常量
+UP = (0, -1)
+DOWN = (0, 1)
+LEFT = (-1, 0)
+RIGHT = (1, 0)
+DIRECTIONS = (UP, DOWN, LEFT, RIGHT)
+
+# 速度与规则常量
+DEFAULT_SPEED = 8  # 默认速度
+MIN_SPEED = 4  # 最小速度
+MAX_SPEED = 15  # 最大速度
+SPEED_CAP = 25  # 加速后的速度上限
+SPEED_STEP = 2  # 每次加速的幅度
+SPEED_UP_EVERY = 5  # 每得5分加速一次
+OBSTACLE_COUNT = 5  # 障碍物数量
+MAX_CATCH_UP = 5  # 一个渲染帧内最多补跑的逻辑帧数
+MIN_BOARD_SIDE = 3  # 棋盘边长下限，再窄时直行会环绕回到紧挨蛇头的那一节
+MAX_BOARD_SIDE = 4096  # 棋盘边长上限（回放文件头用16位保存宽高）
+DENSE_BOARD_LIMIT = 1 << 16  # 格子数不超过此值用稠密 Board，否则用按块分配的 SparseBoard
+CHUNK_BITS = 12  # SparseBoard 每块 4096 个格子
+
+# 占用网格取值
+CELL_EMPTY = 0
+CELL_SNAKE = 1
+CELL_OBSTACLE = 2
+CELL_FOOD = 3
+
+# step() 返回的事件
+MOVE = "MOVE"
+EAT = "EAT"
+DEAD = "DEAD"
+WIN = "WIN"  # 棋盘已满，无处生成食物
+
+
+class Board:
+    """ 占用网格：格子用 y * width + x 打包成整数，碰撞检测为 O(1)
+
+    同时维护空格索引：free 保存所有空格，slot[c] 为格子 c 在 free 中的下标（非空为 -1），
+    占用时与末尾交换后删除，生成食物和障碍物只需随机取一个下标。
+    """
+    __slots__ = ('width', 'height', 'cells', 'free', 'slot')
+
+    def __init__(self, width=GRID_WIDTH, height=GRID_HEIGHT):
+        self.width = width
+        self.height = height
+        self.clear()
+
+    def index(self, pos):
+        return pos[1] * self.width + pos[0]
+
+    def position(self, cell):
+        return (cell % self.width, cell // self.width)
+
+    def clear(self):
+        # 空格索引恢复为固定顺序，同样的随机数序列总能得到同样的布局
+        total = self.width * self.height
+        self.cells = bytearray(total)
+        self.free = list(range(total))
+        self.slot = list(range(total))
+
+    def occupy(self, cell, kind):
+        slot = self.slot[cell]
+        if slot >= 0:
+            free = self.free
+            last = free.pop()
+            if last != cell:
+                free[slot] = last
+                self.slot[last] = slot
+            self.slot[cell] = -1
+        self.cells[cell] = kind
+
+    def release(self, cell):
+        if self.slot[cell] >= 0:
+            return
+        self.cells[cell] = CELL_EMPTY
+        self.slot[cell] = len(self.free)
+        self.free.append(cell)
+
+    def take_random(self, rng, kind):
+        # 随机占用一个空格，棋盘已满时返回 None
+        free = self.free
+        if not free:
+            return None
+        cell = free[rng.randrange(len(free))]
+        self.occupy(cell, kind)
+        return cell
+
+    def occupied(self, start, stop):
+        """ 下标在 [start, stop) 内的非空格子 [(格子, 类型), ...]，绘制时按行裁剪用 """
+        row = self.cells[start:stop]
+        if not row.strip(b'\0'):
+            return []
+        return [(start + i, kind) for i, kind in enumerate(row) if kind]
+
+
+class ChunkedCells:
+    """ 按块分配的占用表，接口与 bytearray 的下标读写相同
+
+    只有含非空格子的块才分配内存，块清空后立即释放，内存与占用格子数成正比。
+    """
+    __slots__ = ('chunks', 'counts', 'size', 'count')
+
+    def __init__(self, size):
+        self.size = size
+        self.chunks = {}  # 块号 -> bytearray
+        self.counts = {}  # 块号 -> 非空格子数
+        self.count = 0  # 全部非空格子数
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, cell):
+        chunk = self.chunks.get(cell >> CHUNK_BITS)
+        return chunk[cell & ((1 << CHUNK_BITS) - 1)] if chunk is not None else CELL_EMPTY
+
+    def __setitem__(self, cell, kind):
+        key = cell >> CHUNK_BITS
+        offset = cell & ((1 << CHUNK_BITS) - 1)
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            if kind == CELL_EMPTY:
+                return
+            chunk = self.chunks[key] = bytearray(1 << CHUNK_BITS)
+            self.counts[key] = 0
+        old = chunk[offset]
+        chunk[offset] = kind
+        if old == CELL_EMPTY and kind != CELL_EMPTY:
+            self.counts[key] += 1
+            self.count += 1
+        elif old != CELL_EMPTY and kind == CELL_EMPTY:
+            self.count -= 1
+            self.counts[key] -= 1
+            if not self.counts[key]:
+                del self.chunks[key]
+                del self.counts[key]
+
+    def occupied(self, start, stop):
+        result = []
+        mask = (1 << CHUNK_BITS) - 1
+        key = start >> CHUNK_BITS
+        while start < stop:
+            end = min(stop, (key + 1) << CHUNK_BITS)
+            chunk = self.chunks.get(key)
+            if chunk is not None:
+                base = key << CHUNK_BITS
+                result.extend((base + i, kind)
+                              for i, kind in enumerate(chunk[start & mask:(end - 1 & mask) + 1], start & mask)
+                              if kind)
+            start = end
+            key += 1
+        return result
+
+
+class SparseBoard(Board):
+    """ 大棋盘：占用表按块分配，不维护空格表（free / slot 为 None）
+
+    空格表的内存与格子总数成正比，2000x2000 的棋盘光这两张表就要几百 MB；
+    这里改为拒绝采样随机取空格，棋盘很空时期望一两次就能取到。
+    """
+    __slots__ = ()
+
+    def clear(self):
+        self.cells = ChunkedCells(self.width * self.height)
+        self.free = None
+        self.slot = None
+
+    def occupy(self, cell, kind):
+        self.cells[cell] = kind
+
+    def release(self, cell):
+        self.cells[cell] = CELL_EMPTY
+
+    def take_random(self, rng, kind):
+        cells = self.cells
+        total = len(cells)
+        if cells.count >= total:
+            return None
+        if cells.count < total * 0.9:
+            while True:
+                cell = rng.randrange(total)
+                if cells[cell] == CELL_EMPTY:
+                    break
+        else:
+            # 几乎占满时拒绝采样太慢，退回到枚举空格
+            free = [c for c in range(total) if cells[c] == CELL_EMPTY]
+            cell = free[rng.randrange(len(free))]
+        self.occupy(cell, kind)
+        return cell
+
+    def occupied(self, start, stop):
+        return self.cells.occupied(start, stop)
+
+
+def check_board_size(width, height):
+    """ 边长超出 MIN_BOARD_SIDE..MAX_BOARD_SIDE 时抛出 ValueError """
+    if not (MIN_BOARD_SIDE <= width <= MAX_BOARD_SIDE and MIN_BOARD_SIDE <= height <= MAX_BOARD_SIDE):
+        raise ValueError(f'棋盘边长必须在 {MIN_BOARD_SIDE}..{MAX_BOARD_SIDE} 之间: {width}x{height}')
+
+
+def make_board(width=GRID_WIDTH, height=GRID_HEIGHT):
+    """ 小棋盘用带空格表的 Board（与批量环境逐位一致），大棋盘用 SparseBoard """
+    check_board_size(width, height)
+    if width * height <= DENSE_BOARD_LIMIT:
+        return Board(width, height)
+    return SparseBoard(width, height)
+
+
+class Obstacle:
+    __slots__ = ('positions', 'board', 'rng', 'count')
+
+    def __init__(self, board, rng=random, count=OBSTACLE_COUNT):
+        self.positions = []
+        self.board = board
+        self.rng = rng
+        self.count = count
+
+    def generate(self):
+        board = self.board
+        # 只释放仍是障碍物的格子，棋盘可能已被 Board.clear() 重置并重新占用
+        for pos in self.positions:
+            cell = board.index(pos)
+            if board.cells[cell] == CELL_OBSTACLE:
+                board.release(cell)
+        self.positions = []
+        # 生成 count 个（默认5个）随机障碍物，只落在空格上
+        for _ in range(self.count):
+            cell = board.take_random(self.rng, CELL_OBSTACLE)
+            if cell is None:
+                break
+            self.positions.append(board.position(cell))
+
+
+class Snake:
+    __slots__ = ('board', 'rng', 'body', 'length', 'direction', 'direction_queue', 'score', 'speed')
+
+    def __init__(self, board, rng=random, start=None):
+        self.board = board
+        self.rng = rng
+        self.body = deque()  # 打包后的格子下标，头在左
+        if start is None:
+            self.reset()
+        else:
+            self.place(start, rng.choice(DIRECTIONS))
+
+    @property
+    def positions(self):
+        # 坐标列表（头在前），仅供绘制等非热路径使用
+        w = self.board.width
+        return [(c % w, c // w) for c in self.body]
+
+    def get_head_position(self):
+        return self.board.position(self.body[0])
+
+    def handle_input(self, new_direction):
+        # 检查新方向是否与当前方向或最后一个队列方向相反
+        current_dir = self.direction_queue[-1] if self.direction_queue else self.direction
+        if ((new_direction[0] * -1, new_direction[1] * -1) != current_dir and
+            (new_direction[0], new_direction[1]) != current_dir):
+            # 限制队列长度为2，保留最新的输入
+            if len(self.direction_queue) < 2:
+                self.direction_queue.append(new_direction)
+
+    def update(self):
+        # 前进一格，撞到自己或障碍物时返回 False；节奏由调用方控制
+        if self.direction_queue:
+            self.direction = self.direction_queue.popleft()
+
+        board = self.board
+        body = self.body
+        w = board.width
+        head = body[0]
+        x, y = self.direction
+        new = ((head // w + y) % board.height) * w + (head % w + x) % w
+
+        # 蛇尾在本帧让出之前仍算占用；紧挨蛇头的一节只有掉头才能撞到，与原先 positions[2:] 一致
+        kind = board.cells[new]
+        if kind == CELL_OBSTACLE or (kind == CELL_SNAKE and (len(body) < 2 or new != body[1])):
+            return False
+
+        # 以下为 Board.occupy / Board.release 的内联版本，这是每帧都走的热路径
+        body.appendleft(new)
+        free = board.free
+        if free is None:
+            # SparseBoard 没有空格表，走通用的 occupy / release
+            board.occupy(new, CELL_SNAKE)
+            if len(body) > self.length:
+                board.release(body.pop())
+            return True
+        slot_of = board.slot
+        slot = slot_of[new]
+        if slot >= 0:
+            last = free.pop()
+            if last != new:
+                free[slot] = last
+                slot_of[last] = slot
+            slot_of[new] = -1
+        board.cells[new] = CELL_SNAKE
+        if len(body) > self.length:
+            tail = body.pop()
+            board.cells[tail] = CELL_EMPTY
+            slot_of[tail] = len(free)
+            free.append(tail)
+        return True
+
+    def reset(self):
+        board = self.board
+        for c in self.body:
+            if board.cells[c] == CELL_SNAKE:
+                board.release(c)
+        start = board.index((board.width // 2, board.height // 2))
+        board.occupy(start, CELL_SNAKE)
+        self.place(start, self.rng.choice(DIRECTIONS))
+
+    def place(self, cell, direction):
+        # 变成位于 cell 的一节新蛇；不改动棋盘，由调用方占用格子（多蛇共用一个棋盘时用）
+        self.body = deque((cell,))
+        self.length = 1
+        self.direction = direction
+        self.direction_queue = deque()
+        self.score = 0
+        self.speed = 10
+
+
+class Food:
+    __slots__ = ('position', 'board', 'rng')
+
+    def __init__(self, board, rng=random):
+        self.position = None
+        self.board = board
+        self.rng = rng
+        self.randomize_position()
+
+    def randomize_position(self):
+        # 只在空格上生成；棋盘已满时 position 为 None
+        board = self.board
+        if self.position is not None:
+            cell = board.index(self.position)
+            if board.cells[cell] == CELL_FOOD:
+                board.release(cell)
+        cell = board.take_random(self.rng, CELL_FOOD)
+        self.position = None if cell is None else board.position(cell)
+
+
+class SnakeEngine:
+    """ 一局游戏的规则状态机：每次 step() 推进一个逻辑帧 """
+
+    def __init__(self, speed=DEFAULT_SPEED, width=GRID_WIDTH, height=GRID_HEIGHT, rng=None,
+                 obstacle_count=OBSTACLE_COUNT):
+        self.width = width
+        self.height = height
+        self.rng = rng if rng is not None else random.Random()
+        self.seed = None  # 最近一次 reset(seed=...) 使用的种子
+        self.start_speed = speed
+        self.board = make_board(width, height)
+        self.snake = Snake(self.board, self.rng)
+        self.food = Food(self.board, self.rng)
+        self.obstacles = Obstacle(self.board, self.rng, obstacle_count)
+        self.ticks = 0
+        self.alive = True
+        self.profiler = None  # 可选的 FrameProfiler，分别记录移动/碰撞和吃食物的耗时
+        self.reset()
+
+    def reset(self, speed=None, seed=None):
+        """ 开始新的一局；给出 seed 时重新播种，同样的种子和输入总能重现同一局 """
+        if speed is not None:
+            self.start_speed = speed
+        if seed is not None:
+            self.seed = seed
+            self.rng.seed(seed)
+        self.board.clear()
+        self.snake.reset()
+        self.snake.speed = self.start_speed
+        self.food.position = None
+        self.food.randomize_position()
+        self.obstacles.generate()
+        self.ticks = 0
+        self.alive = True
+
+    @property
+    def score(self):
+        return self.snake.score
+
+    def step(self, action=None):
+        """ 推进一个逻辑帧，返回 (事件, 分数)；action 为方向元组或 None """
+        if not self.alive:
+            return (WIN if self.food.position is None else DEAD), self.snake.score
+        snake = self.snake
+        if action is not None:
+            snake.handle_input(action)
+        self.ticks += 1
+        profiler = self.profiler
+        if profiler is not None:
+            start = profiler.now()
+
+        moved = snake.update()
+        if profiler is not None:
+            start = profiler.record('update', start)
+        if not moved:
+            self.alive = False
+            return DEAD, snake.score
+
+        event = MOVE
+        food = self.food.position
+        if food is not None and snake.body[0] == self.board.index(food):
+            snake.length += 1
+            snake.score += 1
+            self.food.randomize_position()
+            if snake.score % SPEED_UP_EVERY == 0:
+                snake.speed = min(snake.speed + SPEED_STEP, SPEED_CAP)
+            if self.food.position is None:
+                self.alive = False
+                event = WIN
+            else:
+                event = EAT
+        if profiler is not None:
+            profiler.record('food', start)
+        return event, snake.score
+
+    def get_state(self):
+        """ 导出可完整恢复本局的状态（含随机数状态和空格表顺序），用于回放关键帧 """
+        snake = self.snake
+        return {
+            'ticks': self.ticks,
+            'alive': self.alive,
+            'body': list(snake.body),
+            'length': snake.length,
+            'direction': DIRECTIONS.index(snake.direction),
+            'queue': [DIRECTIONS.index(d) for d in snake.direction_queue],
+            'score': snake.score,
+            'speed': snake.speed,
+            'food': None if self.food.position is None else self.board.index(self.food.position),
+            'obstacles': [self.board.index(p) for p in self.obstacles.positions],
+            'free': None if self.board.free is None else list(self.board.free),
+            'rng': self.rng.getstate(),
+        }
+
+    def set_state(self, state):
+        board = self.board
+        snake = self.snake
+        board.clear()
+        cells = board.cells
+        for c in state['obstacles']:
+            cells[c] = CELL_OBSTACLE
+        for c in state['body']:
+            cells[c] = CELL_SNAKE
+        if state['food'] is not None:
+            cells[state['food']] = CELL_FOOD
+        # 空格表必须按原顺序恢复，之后的随机生成才会落在同样的格子上
+        if state['free'] is not None:
+            board.free = list(state['free'])
+            board.slot = [-1] * len(cells)
+            for i, c in enumerate(board.free):
+                board.slot[c] = i
+        snake.body = deque(state['body'])
+        snake.length = state['length']
+        snake.direction = DIRECTIONS[state['direction']]
+        snake.direction_queue = deque(DIRECTIONS[d] for d in state['queue'])
+        snake.score = state['score']
+        snake.speed = state['speed']
+        self.food.position = None if state['food'] is None else board.position(state['food'])
+        self.obstacles.positions = [board.position(c) for c in state['obstacles']]
+        self.rng.setstate(state['rng'])
+        self.ticks = state['ticks']
+        self.alive = state['alive']
+
+
+class InputQueue:
+    """ 带时间戳的转向缓冲：按键时立即入队，每个逻辑帧边界最多取出一次转向交给蛇
+
+    与当前方向（或缓冲中最后一次转向）相同或相反的按键不算转向，直接忽略；其余转向都保留，
+    缓冲不设上限（每个逻辑帧取走一个，快速连按也只会积压几帧）。时间戳由调用方传入，本身不读时钟。
+    """
+    __slots__ = ('pending', 'accepted')
+
+    def __init__(self):
+        self.pending = deque()  # [(方向, 时间戳), ...]
+        self.accepted = 0
+
+    def __len__(self):
+        return len(self.pending)
+
+    def push(self, direction, timestamp, current):
+        """ current 为蛇此刻的方向；入队返回 True """
+        last = self.pending[-1][0] if self.pending else current
+        if direction == last or direction == (-last[0], -last[1]):
+            return False
+        self.pending.append((direction, timestamp))
+        self.accepted += 1
+        return True
+
+    def pop(self):
+        """ 取出最早的一次转向 (方向, 时间戳)，没有时返回 None """
+        return self.pending.popleft() if self.pending else None
+
+    def clear(self):
+        self.pending.clear()
+
+
+class TickClock:
+    """ 固定步长时钟：按实际经过的时间运行整数个逻辑帧，与渲染帧率解耦
+
+    时间由调用方传入（毫秒），本身不读取真实时钟。单次追赶超过 max_catch_up 帧时，
+    多出的逻辑帧被丢弃并计入 overruns。
+    """
+    __slots__ = ('rate', 'max_catch_up', 'accumulator', 'last_time', 'caught_up', 'ticks', 'overruns', 'late_frames')
+
+    def __init__(self, rate=DEFAULT_SPEED, max_catch_up=MAX_CATCH_UP):
+        self.rate = rate  # 每秒逻辑帧数，即蛇的速度
+        self.max_catch_up = max_catch_up
+        self.ticks = 0  # 已运行的逻辑帧
+        self.overruns = 0  # 因追赶上限被丢弃的逻辑帧
+        self.late_frames = 0  # 需要一次运行多个逻辑帧的渲染帧
+        self.reset(None)
+
+    @property
+    def step_ms(self):
+        return 1000.0 / self.rate
+
+    def reset(self, now):
+        # 开局或从暂停恢复时调用，之前的时间不再补算
+        self.last_time = now
+        self.accumulator = 0.0
+        self.caught_up = 0
+
+    def advance(self, now):
+        """ 记入自上次调用以来经过的时间 """
+        if self.last_time is not None:
+            self.accumulator += max(now - self.last_time, 0)
+        self.last_time = now
+        self.caught_up = 0
+
+    def until_next(self, now):
+        """ 距下一个逻辑帧到期还有多少毫秒 """
+        elapsed = now - self.last_time if self.last_time is not None else 0.0
+        return max(self.step_ms - self.accumulator - elapsed, 0.0)
+
+    def consume(self):
+        """ 还有到期的逻辑帧时消耗一个步长并返回 True """
+        step = self.step_ms
+        if self.accumulator < step:
+            return False
+        if self.caught_up >= self.max_catch_up:
+            dropped = int(self.accumulator // step)
+            self.overruns += dropped
+            self.accumulator -= dropped * step
+            return False
+        self.accumulator -= step
+        self.caught_up += 1
+        self.ticks += 1
+        if self.caught_up == 2:
+            self.late_frames += 1
+        return True
@@ -1,11 +1,22 @@
+import time
+_import_start = time.perf_counter()  # --startup-profile 统计导入耗时用
+
+import argparse
 import pygame
-import random
 import sys
-import json
 import os
-
-# 初始化 Pygame
-pygame.init()
+from collections import OrderedDict
+from leaderboard import Leaderboard
+from persistence import ScoreStore
+from replay import ReplayRecorder
+from autopilot import Autopilot
+from profiler import FrameProfiler, LatencyProbe
+from snake_core import (
+    WINDOW_WIDTH, WINDOW_HEIGHT, GRID_SIZE, GRID_WIDTH, GRID_HEIGHT,
+    UP, DOWN, LEFT, RIGHT, DIRECTIONS, DEFAULT_SPEED, MIN_SPEED, MAX_SPEED,
+    MIN_BOARD_SIDE, MAX_BOARD_SIDE, CELL_EMPTY, CELL_SNAKE, CELL_OBSTACLE, CELL_FOOD, DEAD, WIN,
+    InputQueue, SnakeEngine, TickClock, check_board_size
+)
 
 # 定义颜色
 WHITE = (255, 255, 255)
@@ -36,16 +47,8 @@ DARK_THEME = {
     'obstacle': (100, 100, 100)
 }
 
-# 游戏设置
-WINDOW_WIDTH = 800
-WINDOW_HEIGHT = 600
-GRID_SIZE = 20
-GRID_WIDTH = WINDOW_WIDTH // GRID_SIZE
-GRID_HEIGHT = WINDOW_HEIGHT // GRID_SIZE
-
-# 创建窗口
-screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
-pygame.display.set_caption('贪吃蛇')
+# 窗口在第一次需要时才创建，见 init_display()
+screen = None
 
 # 添加新的颜色常量
 GRID_COLOR = (40, 40, 40)  # 深色网格线
@@ -53,12 +56,63 @@ SNAKE_HEAD_COLOR = (0, 200, 0)  # 蛇头颜色
 SNAKE_BODY_COLOR = (0, 180, 0)  # 蛇身颜色
 FOOD_COLOR = (200, 50, 50)  # 更鲜艳的食物颜色
 OBSTACLE_COLOR = (100, 100, 100)  # 柔和的障碍物颜色
-
-# 添加新的常量
-DEFAULT_SPEED = 8  # 默认速度
-MIN_SPEED = 4  # 最小速度
-MAX_SPEED = 15  # 最大速度
-MAX_LEADERBOARD_ENTRIES = 10  # 排行榜最大记录数
+SPRITE_COLORKEY = (255, 0, 255)  # 精灵表的透明色，任何主题都不会用到
+
+TEXT_CACHE_SIZE = 256  # 文字表面缓存上限
+IDLE_TIMEOUT_MS = 500  # 静态界面等待输入的最长阻塞时间
+PROFILER_REFRESH = 0.25  # 性能浮层的文字每隔多少秒刷新一次
+FRAME_MS = 1000 / 60  # PLAYING 状态的帧间隔上限
+FONT_NAME = 'simhei' if sys.platform.startswith('win') else 'arial'  # 黑体 / Arial
+FONT_CACHE_FILE = 'font_cache.json'  # 字体名 -> 字体文件路径，省去每次启动扫描系统字体
+STARTUP_BUDGET_MS = 1000  # 冷启动到第一帧菜单的预算
+CAMERA_MARGIN = 8  # 蛇头离视口边缘少于这么多格时滚动视口
+REPLAY_DIR = 'replays'  # 回放文件在数据目录下的子目录
+AUTOPILOT_MAX_CELLS = 1 << 11  # 超过这个大小的棋盘，整盘搜索在逻辑帧内做不完，不启用自动驾驶
+
+
+def init_display(size=None):
+    """ 只初始化显示和字体两个子系统并创建窗口；pygame.init() 会连音频等用不到的子系统一起初始化
+
+    size 只在离线导出时给出，画面按目标分辨率直接绘制；不给时沿用已有的画面，否则按窗口大小创建。
+    """
+    global screen
+    if screen is None or (size is not None and screen.get_size() != tuple(size)):
+        pygame.display.init()
+        pygame.font.init()
+        screen = pygame.display.set_mode(size or (WINDOW_WIDTH, WINDOW_HEIGHT))
+        pygame.display.set_caption('贪吃蛇')
+    return screen
+
+
+class FontResolver:
+    """ 字体名到字体文件路径的解析结果持久化在数据目录里
+
+    pygame.font.SysFont 每次启动都要扫描一遍系统字体（Linux 上是 fc-list，Windows 上是注册表），
+    这里只在缓存里没有或文件已不存在时才调用 match_font 扫描一次。
+    """
+
+    def __init__(self, store):
+        self.store = store
+        paths = store.load(FONT_CACHE_FILE, {})
+        self.paths = paths if isinstance(paths, dict) else {}
+        self.misses = 0  # 本次启动实际扫描系统字体的次数
+
+    def path(self, name):
+        path = self.paths.get(name)
+        # 空字符串表示上次就没找到，直接用默认字体，不再扫描
+        if path is None or (path and not os.path.exists(path)):
+            self.misses += 1
+            path = pygame.font.match_font(name) or ''
+            self.paths[name] = path
+            self.store.save(FONT_CACHE_FILE, dict(self.paths))
+        return path or None
+
+    def font(self, name, size):
+        try:
+            return pygame.font.Font(self.path(name), size)
+        except (OSError, pygame.error):
+            print("警告：未找到合适的字体")
+            return pygame.font.Font(None, size)
 
 def get_resource_path(relative_path):
     """ 获取资源文件的绝对路径 """
@@ -70,173 +124,226 @@ def get_resource_path(relative_path):
     
     return os.path.join(base_path, relative_path)
 
-class Obstacle:
-    def __init__(self):
-        self.positions = []
-        self.color = GRAY
-        
-    def generate(self, snake_positions, food_position):
-        self.positions = []
-        # 生成5个随机障碍物
-        for _ in range(5):
-            while True:
-                pos = (random.randint(0, GRID_WIDTH-1),
-                      random.randint(0, GRID_HEIGHT-1))
-                if (pos not in snake_positions and 
-                    pos not in self.positions and 
-                    pos != food_position):
-                    self.positions.append(pos)
-                    break
-
-class Snake:
-    def __init__(self):
-        self.length = 1
-        self.positions = [(GRID_WIDTH // 2, GRID_HEIGHT // 2)]
-        self.direction = random.choice([UP, DOWN, LEFT, RIGHT])
-        self.color = GREEN
-        self.score = 0
-        self.speed = 10  # 初始速度
-        self.direction_queue = []  # 改用方向队列存储多个输入
-        self.last_update_time = 0  # 用于控制更新频率
-
-    def get_head_position(self):
-        return self.positions[0]
-
-    def handle_input(self, new_direction):
-        # 检查新方向是否与当前方向或最后一个队列方向相反
-        current_dir = self.direction_queue[-1] if self.direction_queue else self.direction
-        if ((new_direction[0] * -1, new_direction[1] * -1) != current_dir and
-            (new_direction[0], new_direction[1]) != current_dir):
-            # 限制队列长度为2，保留最新的输入
-            if len(self.direction_queue) < 2:
-                self.direction_queue.append(new_direction)
-
-    def update(self, obstacles):
-        current_time = pygame.time.get_ticks()
-        # 确保有足够的时间间隔再更新方向
-        if current_time - self.last_update_time > 1000 // self.speed:
-            # 处理方向队列
-            if self.direction_queue:
-                self.direction = self.direction_queue.pop(0)
-            
-            cur = self.get_head_position()
-            x, y = self.direction
-            new = ((cur[0] + x) % GRID_WIDTH, (cur[1] + y) % GRID_HEIGHT)
-            
-            if (new in self.positions[2:] or new in obstacles.positions):
-                return False
-            
-            self.positions.insert(0, new)
-            if len(self.positions) > self.length:
-                self.positions.pop()
-            
-            self.last_update_time = current_time
-        return True
-
-    def reset(self):
-        self.length = 1
-        self.positions = [(GRID_WIDTH // 2, GRID_HEIGHT // 2)]
-        self.direction = random.choice([UP, DOWN, LEFT, RIGHT])
-        self.score = 0
-        self.speed = 10
-
-class Food:
-    def __init__(self):
-        self.position = (0, 0)
-        self.color = RED
-        self.randomize_position()
-
-    def randomize_position(self):
-        self.position = (random.randint(0, GRID_WIDTH-1),
-                        random.randint(0, GRID_HEIGHT-1))
+class SpriteAtlas:
+    """ 一种配色的格子精灵：四个方向的蛇头、蛇身、障碍物和食物预先画在同一张表面上
+
+    透明部分用色键，绘制时按区域 blit，画多少格子都不再调用 pygame.draw。
+    size 为格子边长，圆角、眼睛等细节按 GRID_SIZE 下的像素数等比放大。
+    """
+
+    def __init__(self, theme, size=GRID_SIZE):
+        self.size = size
+        self.surface = pygame.Surface((size * (len(DIRECTIONS) + 3), size)).convert()
+        self.surface.fill(SPRITE_COLORKEY)
+        slots = iter(range(len(DIRECTIONS) + 3))
+        self.heads = {}  # 方向 -> 区域
+        for direction in DIRECTIONS:
+            area = self._area(next(slots))
+            self._segment(area, theme['snake_head'])
+            self._eyes(area, direction)
+            self.heads[direction] = area
+        # 按占用类型取区域，CELL_EMPTY 没有精灵
+        self.kinds = [None] * (max(CELL_SNAKE, CELL_OBSTACLE, CELL_FOOD) + 1)
+        area = self.kinds[CELL_SNAKE] = self._area(next(slots))
+        self._segment(area, theme['snake_body'])
+        area = self.kinds[CELL_OBSTACLE] = self._area(next(slots))
+        pygame.draw.rect(self.surface, theme['obstacle'], area.inflate(-self._px(2), -self._px(2)),
+                         border_radius=self._px(3))
+        area = self.kinds[CELL_FOOD] = self._area(next(slots))
+        pygame.draw.circle(self.surface, FOOD_COLOR, area.center, size // 2 - self._px(2))
+        self.surface.set_colorkey(SPRITE_COLORKEY, pygame.RLEACCEL)
+
+    def _px(self, pixels):
+        # GRID_SIZE 下的像素数换算到当前格子边长
+        return max(1, round(pixels * self.size / GRID_SIZE))
+
+    def _area(self, slot):
+        return pygame.Rect(slot * self.size, 0, self.size, self.size)
+
+    def _segment(self, area, color):
+        pygame.draw.rect(self.surface, color, area.inflate(-self._px(2), -self._px(2)), border_radius=self._px(5))
+
+    def _eyes(self, area, direction):
+        x, y = area.topleft
+        size = self.size
+        eye_offset = self._px(4)
+        radius = self._px(2)
+        if direction == LEFT or direction == RIGHT:
+            pygame.draw.circle(self.surface, WHITE, (x + size//2, y + eye_offset), radius)
+            pygame.draw.circle(self.surface, WHITE, (x + size//2, y + size - eye_offset), radius)
+        else:
+            pygame.draw.circle(self.surface, WHITE, (x + eye_offset, y + size//2), radius)
+            pygame.draw.circle(self.surface, WHITE, (x + size - eye_offset, y + size//2), radius)
+
+    def area(self, kind, head_direction=None):
+        """ 一个格子的精灵区域；head_direction 不为 None 时取该方向的蛇头 """
+        return self.heads[head_direction] if head_direction is not None else self.kinds[kind]
+
+
+class RenderCache:
+    """ 绘制缓存：文字表面（LRU）、每种配色的网格背景和格子精灵、可复用的遮罩和分数背板
+
+    size 为画面大小，cell_size 为格子边长；视口区域（GRID_WIDTH x GRID_HEIGHT 格）居中放在 board_rect，
+    画面比例与窗口不同时两侧留出背景色。游戏窗口中两者都是默认值，board_rect 就是整个窗口。
+    """
+
+    def __init__(self, max_text=TEXT_CACHE_SIZE, size=(WINDOW_WIDTH, WINDOW_HEIGHT), cell_size=GRID_SIZE):
+        self.max_text = max_text
+        self.size = size
+        self.cell_size = cell_size
+        board_size = (GRID_WIDTH * cell_size, GRID_HEIGHT * cell_size)
+        self.board_rect = pygame.Rect(((size[0] - board_size[0]) // 2, (size[1] - board_size[1]) // 2), board_size)
+        self.texts = OrderedDict()
+        self.backgrounds = {}
+        self.atlases = {}
+        self.panels = {}
+        self.overlay = None
+
+    def text(self, font, text, color):
+        key = (font, text, color)
+        surface = self.texts.get(key)
+        if surface is None:
+            surface = font.render(text, True, color)
+            self.texts[key] = surface
+            if len(self.texts) > self.max_text:
+                self.texts.popitem(last=False)
+        else:
+            self.texts.move_to_end(key)
+        return surface
+
+    def background(self, color, grid_color):
+        # 按 (底色, 网格色) 缓存整屏网格背景，切换主题后自然换用另一张
+        key = (color, grid_color)
+        surface = self.backgrounds.get(key)
+        if surface is None:
+            surface = pygame.Surface(self.size).convert()
+            surface.fill(color)
+            rect = self.board_rect
+            for x in range(rect.left, rect.right, self.cell_size):
+                pygame.draw.line(surface, grid_color, (x, rect.top), (x, rect.bottom))
+            for y in range(rect.top, rect.bottom, self.cell_size):
+                pygame.draw.line(surface, grid_color, (rect.left, y), (rect.right, y))
+            self.backgrounds[key] = surface
+        return surface
+
+    def sprites(self, theme):
+        # 按精灵用到的配色缓存，切换主题后 clear() 丢掉旧的，第一次绘制时重建
+        key = (theme['snake_head'], theme['snake_body'], theme['obstacle'])
+        atlas = self.atlases.get(key)
+        if atlas is None:
+            atlas = self.atlases[key] = SpriteAtlas(theme, self.cell_size)
+        return atlas
+
+    def panel(self, size, color, alpha):
+        # 半透明背板只随尺寸和颜色变化，分数变化时尺寸通常不变
+        key = (size, color, alpha)
+        surface = self.panels.get(key)
+        if surface is None:
+            if len(self.panels) >= self.max_text:
+                self.panels.clear()
+            surface = pygame.Surface(size).convert()
+            surface.fill(color)
+            surface.set_alpha(alpha)
+            self.panels[key] = surface
+        return surface
+
+    def pause_overlay(self):
+        if self.overlay is None:
+            self.overlay = pygame.Surface(self.size).convert()
+            self.overlay.fill(BLACK)
+            self.overlay.set_alpha(128)
+        return self.overlay
+
+    def clear(self):
+        self.texts.clear()
+        self.backgrounds.clear()
+        self.atlases.clear()
+        self.panels.clear()
 
-# 方向常量
-UP = (0, -1)
-DOWN = (0, 1)
-LEFT = (-1, 0)
-RIGHT = (1, 0)
 
 class Game:
-    def __init__(self):
+    def __init__(self, store=None, cell_size=GRID_SIZE):
+        # 分数文件存放在用户数据目录，首次运行时从随程序打包的文件读取初始数据；
+        # 只借用绘制的场合（如离线导出回放）传入 MemoryStore，不碰数据目录
+        self.store = store if store is not None else ScoreStore(fallback=get_resource_path)
         self.high_score = self.load_high_score()
         self.leaderboard = self.load_leaderboard()
         self.state = "MENU"  # MENU, SETTINGS, PLAYING, PAUSED, GAME_OVER, INPUT_NAME
         self.current_speed = DEFAULT_SPEED
         self.player_name = ""
+        self.last_replay = None  # 刚结束那一局的 (回放文件名, 内容)，进了排行榜才写盘
+        self.autopilot = False  # 游戏中按 A 切换自动驾驶
+        # 分阶段帧计时，F3 显示浮层，F4 导出
+        self.profiler = FrameProfiler()
+        self.latency = LatencyProbe()  # 按键到画面的延迟，同样在浮层显示、随 F4 导出
+        self.show_profiler = False
+        self._profiler_text = None
+        self._profiler_refreshed = 0.0
         self.theme = DARK_THEME  # 添加主题设置
-        # 简化字体设置
-        try:
-            if sys.platform.startswith('win'):
-                self.font = pygame.font.SysFont('simhei', 48)  # 使用黑体
-            else:
-                self.font = pygame.font.SysFont('arial', 48)
-        except:
-            print("警告：未找到合适的字体")
-            self.font = pygame.font.Font(None, 48)
-        
+        # 游戏画面按格子边长 cell_size 绘制在整个显示表面上；离线导出时两者都按目标分辨率放大
+        self.cache = RenderCache(size=init_display().get_size(), cell_size=cell_size)
+        # 字体路径走缓存，三种字号共用一次解析
+        self.fonts = FontResolver(self.store)
+        self.font = self.fonts.font(FONT_NAME, 48)
         # 创建一个小号字体用于显示分数
-        self.small_font = pygame.font.SysFont('simhei', 36) if sys.platform.startswith('win') else pygame.font.SysFont('arial', 36)
+        self.small_font = self.fonts.font(FONT_NAME, 36)
+        self.profiler_font = self.fonts.font(FONT_NAME, 18)
+        self.hud_scale = cell_size / GRID_SIZE
+        self.hud_font = self.small_font if cell_size == GRID_SIZE else self.fonts.font(FONT_NAME, round(36 * self.hud_scale))
 
     def load_high_score(self):
+        data = self.store.load('high_score.json', {})
         try:
-            path = get_resource_path('high_score.json')
-            with open(path, 'r') as f:
-                return json.load(f)['high_score']
-        except:
+            return data['high_score']
+        except (KeyError, TypeError):
             return 0
-            
+
     def save_high_score(self, score):
         if score > self.high_score:
             self.high_score = score
-            path = get_resource_path('high_score.json')
-            with open(path, 'w') as f:
-                json.dump({'high_score': score}, f)
+            # 只提交快照，写盘由后台线程完成，不在游戏结束这一帧阻塞
+            self.store.save('high_score.json', {'high_score': score})
 
     def load_leaderboard(self):
-        try:
-            path = get_resource_path('leaderboard.json')
-            with open(path, 'r') as f:
-                return json.load(f)
-        except:
-            return []
+        data = self.store.load('leaderboard.json', [])
+        if not isinstance(data, list):
+            self.store.set_aside('leaderboard.json')
+            return Leaderboard()
+        leaderboard = Leaderboard.from_list(data)
+        if leaderboard.skipped:
+            print(f"警告：排行榜中有 {leaderboard.skipped} 条记录格式不对，已跳过")
+        return leaderboard
+
+    def save_replay(self, recorder):
+        # 只有能进排行榜的局才保留回放，先留在内存里，等输入名字、记录真正上榜后再写盘
+        self.last_replay = None
+        if self.leaderboard.qualifies(recorder.engine.score, self.current_speed):
+            self.last_replay = (f"{REPLAY_DIR}/{recorder.replay.seed:016x}.snkr", recorder.to_bytes())
 
     def save_leaderboard(self, name, score):
-        # 添加速度信息到记录中
-        new_entry = {
-            "name": name, 
-            "score": score,
-            "speed": self.current_speed  # 添加速度信息
-        }
-        self.leaderboard.append(new_entry)
-        
-        # 按速度分组，每个速度保留前10名
-        speed_groups = {}
-        for entry in self.leaderboard:
-            speed = entry["speed"]
-            if speed not in speed_groups:
-                speed_groups[speed] = []
-            speed_groups[speed].append(entry)
-        
-        # 对每个速度组内的记录按分数排序
-        new_leaderboard = []
-        for speed in speed_groups:
-            speed_groups[speed].sort(key=lambda x: x["score"], reverse=True)
-            new_leaderboard.extend(speed_groups[speed][:MAX_LEADERBOARD_ENTRIES])
-        
-        self.leaderboard = new_leaderboard
-        path = get_resource_path('leaderboard.json')
-        with open(path, 'w') as f:
-            json.dump(self.leaderboard, f)
+        # 按速度分组，每个速度只保留前10名
+        filename, payload = self.last_replay or (None, None)
+        self.last_replay = None
+        rank, evicted = self.leaderboard.add(name, score, self.current_speed, filename)
+        if rank is None:
+            return
+        if filename is not None:
+            # 回放和分数一样交给后台线程写盘
+            self.store.save(filename, payload)
+        self.store.save('leaderboard.json', self.leaderboard.to_list())
+        # 被挤出前 K 名的记录不再需要回放；只删回放目录里的文件，排行榜文件里的路径不可信
+        old = evicted.get("replay") if evicted else None
+        if old and old != filename and os.path.dirname(os.path.normpath(old)) == REPLAY_DIR:
+            self.store.remove(old)
 
     def draw_menu(self):
-        screen.fill(BLACK)
-        self.draw_grid()
+        self.draw_background(BLACK)
         
-        title = self.font.render('贪吃蛇', True, GREEN)
-        start = self.font.render('1. 开始游戏', True, WHITE)
-        settings = self.font.render('2. 设置', True, WHITE)
-        leaderboard = self.font.render('3. 排行榜', True, WHITE)
-        quit_text = self.font.render('4. 退出', True, WHITE)
+        title = self.text(self.font, '贪吃蛇', GREEN)
+        start = self.text(self.font, '1. 开始游戏', WHITE)
+        settings = self.text(self.font, '2. 设置', WHITE)
+        leaderboard = self.text(self.font, '3. 排行榜', WHITE)
+        quit_text = self.text(self.font, '4. 退出', WHITE)
         
         screen.blit(title, (WINDOW_WIDTH//2 - title.get_width()//2, 100))
         screen.blit(start, (WINDOW_WIDTH//2 - start.get_width()//2, 200))
@@ -245,13 +352,12 @@ class Game:
         screen.blit(quit_text, (WINDOW_WIDTH//2 - quit_text.get_width()//2, 410))
 
     def draw_settings(self):
-        screen.fill(self.theme['background'])
-        self.draw_grid()
+        self.draw_background(self.theme['background'])
         
-        title = self.font.render('设置', True, self.theme['text'])
-        speed_text = self.font.render(f'速度: {self.current_speed}', True, self.theme['text'])
-        theme_text = self.font.render(f'主题: {"暗色" if self.theme == DARK_THEME else "亮色"}', True, self.theme['text'])
-        controls = self.small_font.render('左右键调速度，T键切换主题，ESC返回', True, self.theme['text'])
+        title = self.text(self.font, '设置', self.theme['text'])
+        speed_text = self.text(self.font, f'速度: {self.current_speed}', self.theme['text'])
+        theme_text = self.text(self.font, f'主题: {"暗色" if self.theme == DARK_THEME else "亮色"}', self.theme['text'])
+        controls = self.text(self.small_font, '左右键调速度，T键切换主题，ESC返回', self.theme['text'])
         
         screen.blit(title, (WINDOW_WIDTH//2 - title.get_width()//2, 150))
         screen.blit(speed_text, (WINDOW_WIDTH//2 - speed_text.get_width()//2, 250))
@@ -259,34 +365,22 @@ class Game:
         screen.blit(controls, (WINDOW_WIDTH//2 - controls.get_width()//2, 450))
 
     def draw_leaderboard(self):
-        screen.fill(self.theme['background'])
-        self.draw_grid()
+        self.draw_background(self.theme['background'])
         
-        title = self.font.render('排行榜', True, self.theme['text'])
+        title = self.text(self.font, '排行榜', self.theme['text'])
         screen.blit(title, (WINDOW_WIDTH//2 - title.get_width()//2, 50))
         
-        # 按速度分组显示排行榜
-        speed_groups = {}
-        for entry in self.leaderboard:
-            speed = entry["speed"]
-            if speed not in speed_groups:
-                speed_groups[speed] = []
-            speed_groups[speed].append(entry)
-        
+        # 按速度分组显示排行榜，分组和排序结果只在插入新记录后重建
         y_pos = 120
-        for speed in sorted(speed_groups.keys()):
+        for speed, lines in self.leaderboard.view():
             # 显示速度标题
-            speed_text = self.small_font.render(f"速度 {speed}:", True, self.theme['text'])
+            speed_text = self.text(self.small_font, f"速度 {speed}:", self.theme['text'])
             screen.blit(speed_text, (50, y_pos))
             y_pos += 30
             
             # 显示该速度下的前10名
-            for i, entry in enumerate(sorted(speed_groups[speed], key=lambda x: x["score"], reverse=True)[:10]):
-                text = self.small_font.render(
-                    f"{i+1}. {entry['name']}: {entry['score']}", 
-                    True, 
-                    self.theme['text']
-                )
+            for line in lines:
+                text = self.text(self.small_font, line, self.theme['text'])
                 screen.blit(text, (80, y_pos))
                 y_pos += 25
             
@@ -296,18 +390,17 @@ class Game:
             if y_pos > WINDOW_HEIGHT - 60:
                 break
         
-        back = self.small_font.render('按ESC返回', True, self.theme['text'])
+        back = self.text(self.small_font, '按ESC返回', self.theme['text'])
         screen.blit(back, (WINDOW_WIDTH//2 - back.get_width()//2, WINDOW_HEIGHT - 40))
 
     def draw_name_input(self, score):
-        screen.fill(self.theme['background'])
-        self.draw_grid()
+        self.draw_background(self.theme['background'])
         
-        title = self.font.render('新高分！', True, self.theme['text'])
-        score_text = self.font.render(f'得分: {score}', True, self.theme['text'])
-        speed_text = self.font.render(f'速度: {self.current_speed}', True, self.theme['text'])  # 添加速度显示
-        name_text = self.font.render(f'名字: {self.player_name}', True, self.theme['text'])
-        hint = self.small_font.render('输入你的名字并按回车确认', True, self.theme['text'])
+        title = self.text(self.font, '新高分！', self.theme['text'])
+        score_text = self.text(self.font, f'得分: {score}', self.theme['text'])
+        speed_text = self.text(self.font, f'速度: {self.current_speed}', self.theme['text'])  # 添加速度显示
+        name_text = self.text(self.font, f'名字: {self.player_name}', self.theme['text'])
+        hint = self.text(self.small_font, '输入你的名字并按回车确认', self.theme['text'])
         
         screen.blit(title, (WINDOW_WIDTH//2 - title.get_width()//2, 150))
         screen.blit(score_text, (WINDOW_WIDTH//2 - score_text.get_width()//2, 220))
@@ -316,12 +409,11 @@ class Game:
         screen.blit(hint, (WINDOW_WIDTH//2 - hint.get_width()//2, 430))
 
     def draw_game_over(self, score):
-        screen.fill(BLACK)
-        self.draw_grid()
+        self.draw_background(BLACK)
         
-        game_over = self.font.render('游戏结束', True, RED)
-        score_text = self.font.render(f'得分: {score}', True, WHITE)
-        restart = self.font.render('按空格重新开始', True, GREEN)
+        game_over = self.text(self.font, '游戏结束', RED)
+        score_text = self.text(self.font, f'得分: {score}', WHITE)
+        restart = self.text(self.font, '按空格重新开始', GREEN)
         
         screen.blit(game_over, (WINDOW_WIDTH//2 - game_over.get_width()//2, 200))
         screen.blit(score_text, (WINDOW_WIDTH//2 - score_text.get_width()//2, 300))
@@ -329,83 +421,453 @@ class Game:
 
     def draw_paused(self):
         # 保持游戏画面，只添加暂停提示
-        pause_text = self.font.render('已暂停', True, WHITE)
-        continue_text = self.small_font.render('按空格继续', True, WHITE)
+        pause_text = self.text(self.font, '已暂停', WHITE)
+        continue_text = self.text(self.small_font, '按空格继续', WHITE)
         
-        # 创建半透明的黑色遮罩
-        overlay = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT))
-        overlay.fill(BLACK)
-        overlay.set_alpha(128)
-        screen.blit(overlay, (0, 0))
+        # 半透明的黑色遮罩只创建一次
+        screen.blit(self.cache.pause_overlay(), (0, 0))
         
         screen.blit(pause_text, (WINDOW_WIDTH//2 - pause_text.get_width()//2, 250))
         screen.blit(continue_text, (WINDOW_WIDTH//2 - continue_text.get_width()//2, 320))
 
-    def draw_grid(self):
-        for x in range(0, WINDOW_WIDTH, GRID_SIZE):
-            pygame.draw.line(screen, self.theme['grid'], (x, 0), (x, WINDOW_HEIGHT))
-        for y in range(0, WINDOW_HEIGHT, GRID_SIZE):
-            pygame.draw.line(screen, self.theme['grid'], (0, y), (WINDOW_WIDTH, y))
-
-    def draw_snake(self, snake):
-        for i, pos in enumerate(snake.positions):
-            color = self.theme['snake_head'] if i == 0 else self.theme['snake_body']
-            x = pos[0] * GRID_SIZE
-            y = pos[1] * GRID_SIZE
-            
-            rect = pygame.Rect(x + 1, y + 1, GRID_SIZE - 2, GRID_SIZE - 2)
-            pygame.draw.rect(screen, color, rect, border_radius=5)
-            
-            if i == 0:
-                eye_offset = 4
-                if snake.direction == LEFT or snake.direction == RIGHT:
-                    pygame.draw.circle(screen, WHITE, (x + GRID_SIZE//2, y + eye_offset), 2)
-                    pygame.draw.circle(screen, WHITE, (x + GRID_SIZE//2, y + GRID_SIZE - eye_offset), 2)
-                else:
-                    pygame.draw.circle(screen, WHITE, (x + eye_offset, y + GRID_SIZE//2), 2)
-                    pygame.draw.circle(screen, WHITE, (x + GRID_SIZE - eye_offset, y + GRID_SIZE//2), 2)
-
-    def draw_food(self, food):
-        # 绘制食物为圆形
-        x = food.position[0] * GRID_SIZE + GRID_SIZE // 2
-        y = food.position[1] * GRID_SIZE + GRID_SIZE // 2
-        pygame.draw.circle(screen, FOOD_COLOR, (x, y), GRID_SIZE // 2 - 2)
-
-def main():
-    clock = pygame.time.Clock()
+    def text(self, font, text, color):
+        return self.cache.text(font, text, color)
+
+    def set_theme(self, theme):
+        # 切换主题后旧配色的文字和背板不会再用到
+        self.theme = theme
+        self.cache.clear()
+
+    def draw_background(self, color):
+        # 底色加网格，整屏直接贴缓存好的背景
+        screen.blit(self.cache.background(color, self.theme['grid']), (0, 0))
+
+    def draw_sprites(self, cells, heads):
+        """ cells 为视口内的 [(视口x, 视口y, 格子, 类型), ...]，heads 为 {蛇头格子: 方向}；一次 blits 画完 """
+        atlas = self.cache.sprites(self.theme)
+        surface = atlas.surface
+        kinds = atlas.kinds
+        head_areas = atlas.heads
+        size = self.cache.cell_size
+        left, top = self.cache.board_rect.topleft
+        screen.blits([(surface, (left + vx * size, top + vy * size),
+                       head_areas[heads[cell]] if cell in heads else kinds[kind])
+                      for vx, vy, cell, kind in cells], doreturn=False)
+
+    def draw_hud(self, score):
+        # 修改分数显示位置和样式
+        score_text = self.text(self.hud_font, f'得分: {score} 最高分: {self.high_score}', self.theme['text'])
+        board = self.cache.board_rect
+        margin = round(10 * self.hud_scale)
+        score_rect = score_text.get_rect(topright=(board.right - margin, board.top + margin))
+        # 添加半透明背景
+        bg_rect = score_rect.inflate(2 * margin, margin)
+        screen.blit(self.cache.panel(bg_rect.size, self.theme['background'], 200), bg_rect)
+        screen.blit(score_text, score_rect)
+        return bg_rect
+
+    def draw_playing(self, snake, food, camera):
+        profiler = self.profiler
+        start = profiler.now()
+        self.draw_background(self.theme['background'])
+        start = profiler.record('draw_background', start)
+        # 只取视口内的非空格子（食物和障碍物也在棋盘上），耗时与视口大小有关，与蛇长和障碍物总数无关
+        cells = camera.visible()
+        start = profiler.record('draw_cull', start)
+        self.draw_sprites(cells, {snake.body[0]: snake.direction})
+        start = profiler.record('draw_sprites', start)
+        hud_rect = self.draw_hud(snake.score)
+        profiler.record('draw_hud', start)
+        return hud_rect
+
+    def draw_profiler(self, tick_clock, inputs):
+        # 左上角的性能浮层：帧耗时 p50/p99、FPS、被丢弃和补跑的逻辑帧，以及输入延迟和待生效的转向数；
+        # 文字定时刷新，避免撑满文字缓存
+        now = self.profiler.now()
+        if self._profiler_text is None or now - self._profiler_refreshed >= PROFILER_REFRESH:
+            stats = self.profiler.stats()
+            if stats is None:
+                text = '帧耗时统计中...'
+            else:
+                p50, p99, fps = stats
+                text = (f'帧 p50 {p50:.1f}ms p99 {p99:.1f}ms FPS {fps:.0f} '
+                        f'丢帧 {tick_clock.overruns} 补帧 {tick_clock.late_frames}')
+            latency = self.latency.stats()
+            if latency is None:
+                input_text = f'输入延迟统计中... 待生效 {len(inputs)}'
+            else:
+                count, p50, _, p99, _ = latency
+                input_text = f'输入 p50 {p50:.1f}ms p99 {p99:.1f}ms 共 {count} 次 待生效 {len(inputs)}'
+            self._profiler_text = (text, input_text)
+            self._profiler_refreshed = now
+        surfaces = [self.text(self.profiler_font, line, self.theme['text']) for line in self._profiler_text]
+        line_height = surfaces[0].get_height()
+        # 固定宽度的不透明底板，文字变短时也能盖住上一次的内容
+        rect = pygame.Rect(0, 0, WINDOW_WIDTH // 2 + 100, line_height * len(surfaces) + 8)
+        screen.fill(self.theme['background'], rect)
+        for i, surface in enumerate(surfaces):
+            screen.blit(surface, (6, 4 + i * line_height))
+        return rect
+
+    def export_profile(self):
+        # 导出最近的帧记录，CSV 和 Chrome trace 各一份，交给后台线程写到数据目录
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        self.store.save(f'profiles/frames-{stamp}.csv', self.profiler.to_csv().encode('utf-8'))
+        self.store.save(f'profiles/frames-{stamp}.trace.json', self.profiler.to_trace())
+        self.store.save(f'profiles/input-latency-{stamp}.csv', self.latency.to_csv().encode('utf-8'))
+        print(self.latency.report())
+        print(f"性能记录已导出到 {self.store.path('profiles')}")
+
+
+class Camera:
+    """ 视口：窗口一次显示 cols x rows 个格子，棋盘比窗口大时跟随蛇头滚动
+
+    蛇头离视口边缘不足 margin 格时才移动视口，大部分帧视口不动，仍可以只重画变化的格子。
+    棋盘是环绕的，视口也跨边界环绕。
+    """
+
+    def __init__(self, board, view_width=GRID_WIDTH, view_height=GRID_HEIGHT, margin=CAMERA_MARGIN):
+        self.board = board
+        self.cols = min(view_width, board.width)
+        self.rows = min(view_height, board.height)
+        self.margin_x = min(margin, (self.cols - 1) // 2)
+        self.margin_y = min(margin, (self.rows - 1) // 2)
+        self.x = 0  # 视口左上角的格子坐标
+        self.y = 0
+
+    def center(self, cell):
+        w, h = self.board.width, self.board.height
+        if self.cols < w:
+            self.x = (cell % w - self.cols // 2) % w
+        if self.rows < h:
+            self.y = (cell // w - self.rows // 2) % h
+
+    def follow(self, cell):
+        """ 让 cell 留在视口内边距以内，视口移动时返回 True """
+        w, h = self.board.width, self.board.height
+        old = (self.x, self.y)
+        if self.cols < w:
+            dx = (cell % w - self.x) % w
+            if dx < self.margin_x:
+                self.x = (cell % w - self.margin_x) % w
+            elif dx > self.cols - 1 - self.margin_x:
+                self.x = (cell % w - (self.cols - 1 - self.margin_x)) % w
+        if self.rows < h:
+            dy = (cell // w - self.y) % h
+            if dy < self.margin_y:
+                self.y = (cell // w - self.margin_y) % h
+            elif dy > self.rows - 1 - self.margin_y:
+                self.y = (cell // w - (self.rows - 1 - self.margin_y)) % h
+        return (self.x, self.y) != old
+
+    def to_view(self, cell):
+        """ 格子在视口中的坐标，不在视口内返回 None """
+        w = self.board.width
+        vx = (cell % w - self.x) % w
+        vy = (cell // w - self.y) % self.board.height
+        if vx < self.cols and vy < self.rows:
+            return vx, vy
+        return None
+
+    def cell_at(self, vx, vy):
+        """ 视口坐标处的格子，超出棋盘（棋盘比窗口小）时返回 None """
+        if vx >= self.cols or vy >= self.rows:
+            return None
+        w = self.board.width
+        return ((self.y + vy) % self.board.height) * w + (self.x + vx) % w
+
+    def visible(self):
+        """ 视口内的非空格子 [(视口x, 视口y, 格子, 类型), ...]，按行取连续区间，只扫视口 """
+        board = self.board
+        w = board.width
+        result = []
+        for vy in range(self.rows):
+            base = ((self.y + vy) % board.height) * w
+            # 一行在棋盘右边界处环绕时拆成两段
+            first = min(self.cols, w - self.x)
+            spans = [(base + self.x, base + self.x + first, 0)]
+            if first < self.cols:
+                spans.append((base, base + self.cols - first, first))
+            for start, stop, vx0 in spans:
+                for cell, kind in board.occupied(start, stop):
+                    result.append((vx0 + cell - start, vy, cell, kind))
+        return result
+
+
+class DirtyRenderer:
+    """ PLAYING 状态的增量绘制：只重画发生变化的格子，并只把这些矩形交给 display.update """
+
+    def __init__(self, game, camera):
+        self.game = game
+        self.camera = camera
+        self.hud_rect = None
+        self.last = None  # 上一次绘制时的 (蛇头, 蛇尾, 食物, 分数, 最高分)
+        self.ticked = set()  # 自上次绘制以来各逻辑帧经过的蛇头、蛇尾和食物格子
+        self.full_redraw = True
+
+    def invalidate(self):
+        # 主题切换、暂停遮罩、状态切换、视口滚动之后必须整屏重画
+        self.full_redraw = True
+
+    def track(self, snake, food):
+        """ 每个逻辑帧之后调用：一帧内补跑多个逻辑帧时，中间经过的蛇头和让出的蛇尾也要重画
+
+        蛇尾每个逻辑帧最多前进一格，让出的格子就是上一次记下的蛇尾，所以只需记下每帧的头、尾和食物。
+        """
+        ticked = self.ticked
+        ticked.add(snake.body[0])
+        ticked.add(snake.body[-1])
+        if food.position is not None:
+            ticked.add(snake.board.index(food.position))
+
+    def render(self, snake, food):
+        """ 绘制一帧，返回需要提交的矩形列表；返回 None 表示整屏更新 """
+        board = snake.board
+        camera = self.camera
+        profiler = self.game.profiler
+        state = (snake.body[0], snake.body[-1], food.position, snake.score, self.game.high_score)
+        if camera.follow(snake.body[0]):
+            self.full_redraw = True
+        ticked = self.ticked
+        self.ticked = set()
+        if self.full_redraw:
+            self.full_redraw = False
+            self.last = state
+            self.hud_rect = self.game.draw_playing(snake, food, camera)
+            return None
+        if state == self.last:
+            return []
+
+        head, tail, food_pos, score, high_score = self.last
+        self.last = state
+        cells = {head, tail, snake.body[0], snake.body[-1]} | ticked
+        for pos in (food_pos, food.position):
+            if pos is not None:
+                cells.add(board.index(pos))
+        start = profiler.now()
+        rects = []
+        for c in cells:
+            view = camera.to_view(c)
+            if view is not None:
+                rects.append(self.draw_cell(board, c, view, snake))
+        start = profiler.record('draw_cells', start)
+
+        # 分数背板是半透明的，被压住的格子或分数本身变化时要先恢复底下的格子再叠加
+        hud_dirty = score != snake.score or high_score != self.game.high_score
+        if hud_dirty or self.hud_rect.collidelist(rects) != -1:
+            for view in self.cells_under(self.hud_rect):
+                c = camera.cell_at(*view)
+                if c not in cells:
+                    self.draw_cell(board, c, view, snake)
+            old_hud = self.hud_rect
+            self.hud_rect = self.game.draw_hud(snake.score)
+            rects.append(old_hud.union(self.hud_rect))
+            profiler.record('draw_hud', start)
+        return rects
+
+    def cells_under(self, rect):
+        # 矩形覆盖的视口坐标
+        size = self.game.cache.cell_size
+        rect = rect.move(-self.game.cache.board_rect.left, -self.game.cache.board_rect.top)
+        x0 = max(rect.left // size, 0)
+        x1 = min((rect.right - 1) // size, GRID_WIDTH - 1)
+        y0 = max(rect.top // size, 0)
+        y1 = min((rect.bottom - 1) // size, GRID_HEIGHT - 1)
+        return [(x, y) for y in range(y0, y1 + 1) for x in range(x0, x1 + 1)]
+
+    def draw_cell(self, board, cell, view, snake):
+        # 先从缓存背景恢复底色和网格，再贴上这一格的精灵；cell 为 None 时只恢复背景
+        game = self.game
+        size = game.cache.cell_size
+        left, top = game.cache.board_rect.topleft
+        rect = pygame.Rect(left + view[0] * size, top + view[1] * size, size, size)
+        screen.blit(game.cache.background(game.theme['background'], game.theme['grid']), rect, rect)
+        kind = board.cells[cell] if cell is not None else CELL_EMPTY
+        if kind != CELL_EMPTY:
+            atlas = game.cache.sprites(game.theme)
+            screen.blit(atlas.surface, rect, atlas.area(kind, snake.direction if cell == snake.body[0] else None))
+        return rect
+
+
+class IdleScheduler:
+    """ 静态界面的事件驱动调度：没有输入和状态变化时阻塞在 event.wait 上，不再以60帧空转 """
+
+    def __init__(self, timeout=IDLE_TIMEOUT_MS):
+        self.timeout = timeout
+        self.dirty = True
+        self.carry = []  # sleep() 提前醒来时收到的事件，留给下一次 poll
+
+    def mark_dirty(self):
+        self.dirty = True
+
+    def sleep(self, timeout):
+        """ PLAYING 状态的帧间等待：最多阻塞 timeout 毫秒，有事件到达时立即醒来，按键时间戳更准 """
+        event = pygame.event.wait(timeout)
+        if event.type != pygame.NOEVENT:
+            self.carry.append(event)
+
+    def poll(self, active):
+        """ 取出待处理事件；active 为假且界面无需重画时最多阻塞 timeout 毫秒 """
+        events = self.carry + pygame.event.get()
+        self.carry = []
+        if not active and not events and not self.dirty:
+            event = pygame.event.wait(self.timeout)
+            if event.type != pygame.NOEVENT:
+                events = [event] + pygame.event.get()
+        # 鼠标移动不会改变任何界面，其余事件（按键、窗口重新显示等）都触发重画
+        if any(event.type != pygame.MOUSEMOTION for event in events):
+            self.dirty = True
+        return events
+
+    def should_draw(self):
+        dirty = self.dirty
+        self.dirty = False
+        return dirty
+
+
+def quit_game(game):
+    # 退出前等后台线程把分数写完
+    game.store.close()
+    pygame.quit()
+    sys.exit()
+
+
+def draw_static_screen(game, engine, camera):
+    # 除 PLAYING 以外的界面都是静态的，只在需要时整屏重画一次
+    start = game.profiler.now()
+    if game.state == "MENU":
+        game.draw_menu()
+    elif game.state == "SETTINGS":
+        game.draw_settings()
+    elif game.state == "LEADERBOARD":
+        game.draw_leaderboard()
+    elif game.state == "INPUT_NAME":
+        game.draw_name_input(engine.score)
+    elif game.state == "PAUSED":
+        # 每次都从游戏画面重新叠加遮罩，避免多次叠加越来越暗
+        game.draw_playing(engine.snake, engine.food, camera)
+        game.draw_paused()
+    elif game.state == "GAME_OVER":
+        game.draw_game_over(engine.score)  # 在游戏结束界面也显示网格
+    game.profiler.record('draw_static', start)
+
+
+class StartupProfile:
+    """ --startup-profile：记录冷启动各阶段耗时，第一帧菜单显示后打印 """
+
+    def __init__(self):
+        self.timings = [('导入模块', (_import_done - _import_start) * 1000)]
+        self.last = time.perf_counter()
+
+    def mark(self, label):
+        now = time.perf_counter()
+        self.timings.append((label, (now - self.last) * 1000))
+        self.last = now
+
+    def report(self, game):
+        total = sum(ms for _, ms in self.timings)
+        for label, ms in self.timings:
+            print(f"{label:<16s}{ms:8.1f} ms")
+        print(f"{'字体缓存未命中':<16s}{game.fonts.misses:8d} 次")
+        verdict = '达标' if total <= STARTUP_BUDGET_MS else '超出预算'
+        print(f"{'合计':<16s}{total:8.1f} ms（预算 {STARTUP_BUDGET_MS} ms，{verdict}）")
+
+
+def board_size(text):
+    """ 解析 --board 参数，如 2000x2000 """
+    try:
+        width, height = (int(v) for v in text.lower().split('x'))
+        check_board_size(width, height)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(f'无效的棋盘大小 {text}: {e}')
+    return width, height
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='贪吃蛇')
+    parser.add_argument('--startup-profile', action='store_true', help='打印从启动到第一帧菜单的各阶段耗时')
+    parser.add_argument('--board', type=board_size, default=(GRID_WIDTH, GRID_HEIGHT), metavar='宽x高',
+                        help=(f'棋盘大小，默认与窗口一致（{GRID_WIDTH}x{GRID_HEIGHT}），'
+                              f'最小 {MIN_BOARD_SIDE}x{MIN_BOARD_SIDE}，最大 {MAX_BOARD_SIDE}x{MAX_BOARD_SIDE}'))
+    args = parser.parse_args(argv)
+    startup = StartupProfile() if args.startup_profile else None
+
+    init_display()
+    if startup:
+        startup.mark('初始化显示')
     game = Game()
-    snake = Snake()
-    food = Food()
-    obstacles = Obstacle()
-    
+    if startup:
+        startup.mark('加载字体和分数')
+    # 规则引擎只负责状态，这里仅负责输入、节奏和绘制
+    engine = SnakeEngine(game.current_speed, *args.board)
+    # 每局随机选种子并记录输入，结束后存成回放，可用 replay.py 重放核对分数
+    recorder = ReplayRecorder(engine)
+    # 寻路表在进入主循环前建好，按 A 只切换开关
+    pilot = Autopilot(engine) if engine.board.width * engine.board.height <= AUTOPILOT_MAX_CELLS else None
+    snake = engine.snake
+    food = engine.food
+    tick_clock = TickClock(game.current_speed)
+    # 按键先进带时间戳的缓冲，每个逻辑帧边界取出一次转向，快速连按也不会丢
+    inputs = InputQueue()
+    latency = game.latency
+    # 棋盘比窗口大时视口跟随蛇头，只绘制视口内的格子
+    camera = Camera(engine.board)
+    renderer = DirtyRenderer(game, camera)
+    scheduler = IdleScheduler()
+    profiler = game.profiler
+    engine.profiler = profiler
+    last_state = None
+    if startup:
+        startup.mark('创建引擎')
+
     while True:
+        # 每轮循环算一帧，各阶段的耗时写入 profiler
+        profiler.end_frame()
+        frame_start = start = profiler.begin_frame()
+        # 状态切换后整屏重画；PLAYING 状态只提交变化的矩形
+        if game.state != last_state:
+            renderer.invalidate()
+            scheduler.mark_dirty()
+            latency.discard()  # 切换前生效的输入不会按原画面显示，不计延迟
+            last_state = game.state
+            if game.state == "PLAYING":
+                # 开局或从暂停恢复时重新计时，暂停期间的时间不补跑
+                tick_clock.reset(time.perf_counter() * 1000)
+        events = scheduler.poll(game.state == "PLAYING")
+        polled = start = profiler.record('events', start)  # 本帧按键的时间戳
+
+        for event in events:
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_F3:
+                    game.show_profiler = not game.show_profiler
+                    renderer.invalidate()
+                    scheduler.mark_dirty()
+                elif event.key == pygame.K_F4:
+                    game.export_profile()
+
         if game.state == "MENU":
-            game.draw_menu()
-            for event in pygame.event.get():
+            for event in events:
                 if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
+                    quit_game(game)
                 if event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_1:
                         game.state = "PLAYING"
-                        snake.reset()
-                        snake.speed = game.current_speed
-                        food.randomize_position()
-                        obstacles.generate(snake.positions, food.position)
+                        recorder.start(game.current_speed)
+                        inputs.clear()
+                        camera.center(snake.body[0])
+                        if pilot is not None:
+                            pilot.reset()
                     elif event.key == pygame.K_2:
                         game.state = "SETTINGS"
                     elif event.key == pygame.K_3:
                         game.state = "LEADERBOARD"
                     elif event.key == pygame.K_4:
-                        pygame.quit()
-                        sys.exit()
+                        quit_game(game)
 
         elif game.state == "SETTINGS":
-            game.draw_settings()
-            for event in pygame.event.get():
+            for event in events:
                 if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
+                    quit_game(game)
                 if event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_ESCAPE:
                         game.state = "MENU"
@@ -414,24 +876,20 @@ def main():
                     elif event.key == pygame.K_RIGHT:
                         game.current_speed = min(MAX_SPEED, game.current_speed + 1)
                     elif event.key == pygame.K_t:  # 添加主题切换
-                        game.theme = LIGHT_THEME if game.theme == DARK_THEME else DARK_THEME
+                        game.set_theme(LIGHT_THEME if game.theme == DARK_THEME else DARK_THEME)
 
         elif game.state == "LEADERBOARD":
-            game.draw_leaderboard()
-            for event in pygame.event.get():
+            for event in events:
                 if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
+                    quit_game(game)
                 if event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_ESCAPE:
                         game.state = "MENU"
 
         elif game.state == "INPUT_NAME":
-            game.draw_name_input(snake.score)
-            for event in pygame.event.get():
+            for event in events:
                 if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
+                    quit_game(game)
                 if event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_RETURN and game.player_name:
                         game.save_leaderboard(game.player_name, snake.score)
@@ -444,90 +902,110 @@ def main():
                             game.player_name += event.unicode
 
         elif game.state == "PLAYING":
-            for event in pygame.event.get():
+            for event in events:
                 if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
+                    quit_game(game)
                 elif event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_UP:
-                        snake.handle_input(UP)
+                        inputs.push(UP, polled, snake.direction)
                     elif event.key == pygame.K_DOWN:
-                        snake.handle_input(DOWN)
+                        inputs.push(DOWN, polled, snake.direction)
                     elif event.key == pygame.K_LEFT:
-                        snake.handle_input(LEFT)
+                        inputs.push(LEFT, polled, snake.direction)
                     elif event.key == pygame.K_RIGHT:
-                        snake.handle_input(RIGHT)
+                        inputs.push(RIGHT, polled, snake.direction)
+                    elif event.key == pygame.K_a:
+                        if pilot is None:
+                            print("警告：棋盘过大，自动驾驶不可用")
+                        else:
+                            game.autopilot = not game.autopilot
                     elif event.key == pygame.K_SPACE:  # 添加暂停功能
                         game.state = "PAUSED"
                     elif event.key == pygame.K_ESCAPE:
                         game.state = "MENU"
 
-            if not snake.update(obstacles):
-                game.save_high_score(snake.score)
-                game.state = "INPUT_NAME"  # 改为先输入名字
-                continue
-
-            if snake.get_head_position() == food.position:
-                snake.length += 1
-                snake.score += 1
-                food.randomize_position()
-                if snake.score % 5 == 0:
-                    snake.speed = min(snake.speed + 2, 25)
-
-            screen.fill(game.theme['background'])
-            game.draw_grid()
-            
-            # 绘制障碍物
-            for pos in obstacles.positions:
-                rect = pygame.Rect(pos[0] * GRID_SIZE + 1, 
-                                 pos[1] * GRID_SIZE + 1,
-                                 GRID_SIZE - 2, GRID_SIZE - 2)
-                pygame.draw.rect(screen, game.theme['obstacle'], rect, border_radius=3)
-            
-            game.draw_food(food)
-            game.draw_snake(snake)
-
-            # 修改分数显示位置和样式
-            score_text = game.small_font.render(f'得分: {snake.score} 最高分: {game.high_score}', True, game.theme['text'])
-            score_rect = score_text.get_rect(topright=(WINDOW_WIDTH - 10, 10))
-            # 添加半透明背景
-            bg_surface = pygame.Surface((score_rect.width + 20, score_rect.height + 10))
-            bg_surface.fill(game.theme['background'])
-            bg_surface.set_alpha(200)
-            screen.blit(bg_surface, (score_rect.x - 10, score_rect.y - 5))
-            screen.blit(score_text, score_rect)
+            # 固定步长：按实际经过的时间运行整数个逻辑帧，卡顿后最多补跑 MAX_CATCH_UP 帧
+            tick_clock.rate = snake.speed
+            tick_clock.advance(time.perf_counter() * 1000)
+            while game.state == "PLAYING" and tick_clock.consume():
+                # 每个逻辑帧边界最多生效一次转向，其余的留在缓冲里给之后的逻辑帧
+                turn = inputs.pop()
+                if turn is not None:
+                    recorder.handle_input(turn[0])
+                    latency.applied(turn[1])
+                if game.autopilot and pilot is not None:
+                    # 自动驾驶的决策同样作为输入记录，回放照常有效
+                    start = profiler.now()
+                    direction = pilot.decide()
+                    if direction is not None:
+                        recorder.handle_input(direction)
+                    profiler.record('autopilot', start)
+                tick_event, score = recorder.step()
+                renderer.track(snake, food)
+                tick_clock.rate = snake.speed  # 吃到食物后可能加速
+                if tick_event in (DEAD, WIN):  # 撞死或占满棋盘都结束本局
+                    start = profiler.now()
+                    game.save_high_score(score)
+                    game.save_replay(recorder)
+                    profiler.record('save', start)
+                    game.state = "INPUT_NAME"  # 改为先输入名字
 
         elif game.state == "PAUSED":
-            for event in pygame.event.get():
+            for event in events:
                 if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
+                    quit_game(game)
                 elif event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_SPACE:
                         game.state = "PLAYING"
                     elif event.key == pygame.K_ESCAPE:
                         game.state = "MENU"
-            
-            # 绘制暂停界面
-            game.draw_paused()
+
 
         elif game.state == "GAME_OVER":
-            screen.fill(BLACK)
-            game.draw_grid()  # 在游戏结束界面也显示网格
-            game.draw_game_over(snake.score)
-            for event in pygame.event.get():
+            for event in events:
                 if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
+                    quit_game(game)
                 if event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_SPACE:
                         game.state = "MENU"
 
-        pygame.display.update()
+        # 本轮切换了状态就留到下一轮按新状态整屏重画
+        if game.state != last_state:
+            continue
+
         if game.state == "PLAYING":
-            clock.tick(60)  # 保持60FPS的更新率，移动速度由Snake类控制
+            update_rects = renderer.render(snake, food)
+        elif scheduler.should_draw():
+            draw_static_screen(game, engine, camera)
+            update_rects = None
         else:
-            clock.tick(60)
+            update_rects = []
+        if game.show_profiler:
+            profiler_rect = game.draw_profiler(tick_clock, inputs)
+            if update_rects is not None:
+                update_rects.append(profiler_rect)
+
+        start = profiler.now()
+        if update_rects is None:
+            pygame.display.update()
+        elif update_rects:
+            pygame.display.update(update_rects)
+        latency.displayed()
+        start = profiler.record('display', start)
+        if startup and update_rects is None:
+            startup.mark('绘制第一帧')
+            startup.report(game)
+            startup = None
+        if game.state == "PLAYING":
+            # 睡到下一帧或下一个逻辑帧到期，取先到者：逻辑帧一到期就醒来运行并显示，不必等满一帧；
+            # 有按键时提前醒来，按键立即打上时间戳进入缓冲
+            frame_left = FRAME_MS - (profiler.now() - frame_start) * 1000
+            delay = min(frame_left, tick_clock.until_next(time.perf_counter() * 1000))
+            if delay >= 1:
+                scheduler.sleep(int(delay))
+            profiler.record('sleep', start)
+
+_import_done = time.perf_counter()
 
 if __name__ == '__main__':
     main() 
\ No newline at end of file
@@ -0,0 +1,66 @@
+import random
+
+from arena import DELTA_HEADER, ArenaMirror, ArenaWorld
+from snake_core import DIRECTIONS
+
+
+def _play(world, rng, ticks, mirrors, turn_chance=0.3):
+    # 每帧随机转向，把编码后的变化交给所有镜像，返回各镜像 apply() 的结果
+    results = []
+    for _ in range(ticks):
+        for pid in list(world.players):
+            if rng.random() < turn_chance:
+                world.handle_input(pid, rng.choice(DIRECTIONS))
+        payload = world.step().encode()
+        results.extend(mirror.apply(payload) for mirror in mirrors)
+    return results
+
+
+def _assert_same(world, mirror):
+    assert mirror.tick == world.ticks
+    assert bytes(mirror.board.cells) == bytes(world.board.cells)
+    assert mirror.food == world.food
+    live = {p.id: p.snake for p in world.players.values() if p.snake is not None}
+    assert set(mirror.snakes) == set(live)
+    for sid, snake in live.items():
+        assert list(mirror.snakes[sid].body) == list(snake.body)
+        assert mirror.snakes[sid].score == snake.score
+
+
+def test_mirror_follows_world_through_deltas():
+    # 小棋盘上多名玩家频繁相撞、死亡和重生；中途加入的镜像从快照开始也要一直保持同步
+    rng = random.Random(1)
+    world = ArenaWorld(40, 30, rng=random.Random(2), obstacle_count=20)
+    first = world.join()
+    for _ in range(5):
+        world.join()
+    early = ArenaMirror(world.snapshot(first, 15))
+    assert all(_play(world, rng, 200, [early]))
+    late = ArenaMirror(world.snapshot(first, 15))
+    world.leave(first)
+    assert all(_play(world, rng, 200, [early, late]))
+    assert early.desyncs == late.desyncs == 0
+    _assert_same(world, early)
+    _assert_same(world, late)
+    assert sum(p.deaths for p in world.players.values()) > 0
+
+
+def test_checksum_detects_divergence():
+    world = ArenaWorld(40, 30, rng=random.Random(3), obstacle_count=20)
+    pid = world.join()
+    mirror = ArenaMirror(world.snapshot(pid, 15))
+    payload = bytearray(world.step().encode())
+    checksum_at = DELTA_HEADER.size - 4
+    payload[checksum_at] ^= 0xff  # 校验和对不上，说明镜像走偏
+    assert not mirror.apply(bytes(payload))
+    assert mirror.desyncs == 1
+
+
+def test_skipped_delta_is_reported():
+    world = ArenaWorld(40, 30, rng=random.Random(4), obstacle_count=20)
+    pid = world.join()
+    world.step()  # 先让蛇出生，之后的帧只有移动
+    mirror = ArenaMirror(world.snapshot(pid, 15))
+    world.step()  # 这一帧的变化丢了
+    assert not mirror.apply(world.step().encode())
+    assert mirror.desyncs == 1
@@ -0,0 +1,83 @@
+import json
+import random
+
+import pytest
+
+from autopilot import Autopilot
+from replay import Replay, ReplayError, ReplayPlayer, ReplayRecorder, audit, verify
+from snake_core import SnakeEngine
+
+
+def _record(seed=11, max_ticks=600, keyframe_interval=50):
+    # 自动驾驶打一局并录下回放；自动驾驶的方向同样经 handle_input 记录
+    engine = SnakeEngine(rng=random.Random())
+    recorder = ReplayRecorder(engine, keyframe_interval)
+    recorder.start(seed=seed)
+    pilot = Autopilot(engine)
+    while engine.alive and engine.ticks < max_ticks:
+        direction = pilot.decide()
+        if direction is not None and direction != engine.snake.direction:
+            recorder.handle_input(direction)
+        recorder.step()
+    return recorder.replay, engine
+
+
+@pytest.fixture(scope='module')
+def recorded():
+    return _record()
+
+
+def test_round_trip_preserves_everything(recorded):
+    replay, _ = recorded
+    copy = Replay.from_bytes(replay.to_bytes())
+    assert vars(copy) == vars(replay)
+    assert copy.to_bytes() == replay.to_bytes()
+
+
+def test_verify_replays_to_recorded_score(recorded):
+    replay, engine = recorded
+    assert engine.score > 0 and replay.keyframes
+    ok, _ = verify(replay, engine.score)
+    assert ok
+    ok, _ = verify(replay, engine.score + 1)
+    assert not ok
+
+
+def test_seek_matches_stepping(recorded):
+    # 借助关键帧跳转（包括往回跳）的结果必须与从头逐帧重放完全相同
+    replay, _ = recorded
+    sequential = ReplayPlayer(replay)
+    states = {}
+    targets = {0, 1, 49, 50, 51, 137, 300, replay.final_ticks}
+    while sequential.ticks < replay.final_ticks:
+        sequential.step()
+        if sequential.ticks in targets:
+            states[sequential.ticks] = sequential.engine.get_state()
+    player = ReplayPlayer(replay)
+    for tick in sorted(states, reverse=True) + sorted(states):
+        player.seek(tick)
+        assert player.ticks == tick
+        assert player.engine.get_state() == states[tick]
+
+
+@pytest.mark.parametrize('cut', [1, 10, -1])
+def test_truncated_file_is_rejected(recorded, cut):
+    data = recorded[0].to_bytes()
+    with pytest.raises(ReplayError):
+        Replay.from_bytes(data[:cut])
+
+
+def test_audit_counts_bad_entries_instead_of_crashing(recorded, tmp_path, capsys):
+    replay, engine = recorded
+    (tmp_path / 'good.snkr').write_bytes(replay.to_bytes())
+    entries = [
+        {'name': 'ok', 'score': engine.score, 'speed': replay.speed, 'replay': 'good.snkr'},
+        {'name': 'inflated', 'score': engine.score + 5, 'speed': replay.speed, 'replay': 'good.snkr'},
+        {'name': 'missing', 'score': 1, 'speed': replay.speed, 'replay': 'nope.snkr'},
+        {'name': 'malformed'},
+        'not an entry',
+    ]
+    path = tmp_path / 'leaderboard.json'
+    path.write_text(json.dumps(entries))
+    assert audit(str(path), str(tmp_path)) == 4
+    assert '通过' in capsys.readouterr().out
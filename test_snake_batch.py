@@ -0,0 +1,47 @@
+import random
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from snake_batch import EVENT_NAMES, EVENT_WIN, BatchSnakeEnv  # noqa: E402
+from snake_core import DENSE_BOARD_LIMIT, DIRECTIONS, DEAD, SnakeEngine  # noqa: E402
+
+
+def _run_both(num_envs, ticks, width, height, seed=0):
+    """ 同样的种子和动作分别喂给批量环境和逐局引擎，逐帧比较事件、分数和蛇身，返回批量环境的事件列表 """
+    env = BatchSnakeEnv(num_envs, width=width, height=height, seeds=range(seed, seed + num_envs))
+    engines = [SnakeEngine(width=width, height=height, rng=random.Random(seed + i)) for i in range(num_envs)]
+    actions = np.random.default_rng(seed).integers(-1, 4, (ticks, num_envs))
+    history = []
+    for row in actions:
+        events, scores = env.step(row)
+        history.append(events.copy())
+        for i, engine in enumerate(engines):
+            event, score = engine.step(None if row[i] < 0 else DIRECTIONS[row[i]])
+            assert (EVENT_NAMES[events[i]], scores[i]) == (event, score)
+            if event != DEAD:
+                assert env.positions(i) == engine.snake.positions
+                assert env.food[i] == (-1 if engine.food.position is None else engine.board.index(engine.food.position))
+            if event in (DEAD, EVENT_NAMES[EVENT_WIN]):
+                engine.reset()
+        if not env.alive.all():
+            env.reset(np.flatnonzero(~env.alive))
+    return history
+
+
+def test_batch_matches_scalar_engine():
+    # 默认棋盘，随机动作下频繁死亡和重开，覆盖 reset() 的批量抽数与吃食物后的重生
+    history = _run_both(32, 600, 40, 30)
+    assert any((events == 1).any() for events in history)  # 确实吃到过食物
+
+
+def test_batch_matches_scalar_engine_on_tiny_boards_with_wins():
+    # 3x3 棋盘放完障碍物后只剩两格空地，吃满即获胜，覆盖没有空格时的分支
+    history = _run_both(64, 300, 3, 3)
+    assert any((events == EVENT_WIN).any() for events in history)
+
+
+def test_oversized_board_is_rejected():
+    with pytest.raises(ValueError):
+        BatchSnakeEnv(1, width=256, height=DENSE_BOARD_LIMIT // 256 + 1)
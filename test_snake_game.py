@@ -0,0 +1,45 @@
+import os
+import random
+
+import pytest
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+pygame = pytest.importorskip('pygame')
+
+import snake_game  # noqa: E402
+from autopilot import Autopilot  # noqa: E402
+from persistence import MemoryStore  # noqa: E402
+from snake_core import SnakeEngine  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def game():
+    snake_game.init_display()
+    return snake_game.Game(MemoryStore())
+
+
+def _screen_bytes():
+    return pygame.image.tostring(snake_game.screen, 'RGB')
+
+
+@pytest.mark.parametrize('ticks_per_frame', [1, 2, 5])
+def test_incremental_frame_matches_full_redraw(game, ticks_per_frame):
+    # 每帧补跑多个逻辑帧后，增量绘制的结果必须与整屏重画逐像素相同
+    engine = SnakeEngine(rng=random.Random(3), obstacle_count=0)
+    engine.snake.length = 12  # 蛇身足够长，中间逻辑帧经过的格子才会留在画面上
+    camera = snake_game.Camera(engine.board)
+    renderer = snake_game.DirtyRenderer(game, camera)
+    renderer.render(engine.snake, engine.food)
+    pilot = Autopilot(engine)
+    for _ in range(40):
+        for _ in range(ticks_per_frame):
+            engine.step(pilot.decide())
+            assert engine.alive
+            renderer.track(engine.snake, engine.food)
+        renderer.render(engine.snake, engine.food)
+        incremental = _screen_bytes()
+        renderer.invalidate()
+        renderer.render(engine.snake, engine.food)
+        assert incremental == _screen_bytes()
@@ -0,0 +1,239 @@
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+from autopilot import Autopilot
+from snake_core import (
+    GRID_WIDTH, GRID_HEIGHT, DEFAULT_SPEED, MIN_SPEED, MAX_SPEED, OBSTACLE_COUNT, DIRECTIONS, DEAD, WIN, SnakeEngine
+)
+
+# 锦标赛：在进程池中批量运行无界面对局，按种子、障碍物数量扫描并汇总统计
+#
+# 任务按块分发，每个工作进程复用自己的引擎和策略对象，只把每局的结果（几个整数）传回主进程，
+# 进程间通信量与对局长度无关，所以吞吐量随核数近似线性增长。
+# 不同障碍物设置使用同一组种子，便于逐局对比。
+# 无界面对局按逻辑帧推进，速度只决定真实时间里每秒跑几帧，不影响规则、策略和随机数，
+# 扫描多个速度只会重复得到同样的结果，所以速度只作为记录用的单个参数。
+
+
+class RandomPolicy:
+    """ 每帧以一定概率随机转向，种子取自对局种子，结果可复现 """
+
+    def __init__(self, engine, turn_chance=0.2):
+        self.engine = engine
+        self.turn_chance = turn_chance
+        self.rng = random.Random()
+
+    def reset(self):
+        self.rng.seed(self.engine.seed)
+
+    def decide(self):
+        if self.rng.random() < self.turn_chance:
+            return self.rng.choice(DIRECTIONS)
+        return None
+
+
+class IdlePolicy:
+    """ 从不转向，作为基线 """
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def reset(self):
+        pass
+
+    def decide(self):
+        return None
+
+
+POLICIES = {
+    'autopilot': Autopilot,
+    'random': RandomPolicy,
+    'idle': IdlePolicy,
+}
+
+RESULT_NAMES = {DEAD: 'dead', WIN: 'win'}
+
+# 工作进程内复用的 (引擎, 策略)，按障碍物数量区分
+_players = {}
+
+
+def _player(policy, width, height, obstacles):
+    key = (policy, width, height, obstacles)
+    if key not in _players:
+        engine = SnakeEngine(width=width, height=height, rng=random.Random(), obstacle_count=obstacles)
+        _players[key] = (engine, POLICIES[policy](engine))
+    return _players[key]
+
+
+def play_game(engine, policy, speed, seed, max_ticks):
+    """ 按给定种子下完一局，返回结果字典 """
+    engine.reset(speed, seed)
+    policy.reset()
+    event = None
+    while engine.alive and engine.ticks < max_ticks:
+        event, _ = engine.step(policy.decide())
+    return {
+        'score': engine.score,
+        'ticks': engine.ticks,
+        'result': RESULT_NAMES.get(event, 'timeout'),
+    }
+
+
+def run_chunk(task):
+    """ 工作进程入口：task 为 (策略, 宽, 高, 速度, 帧数上限, [(种子, 障碍物数), ...]) """
+    policy_name, width, height, speed, max_ticks, jobs = task
+    start = time.perf_counter()
+    games = []
+    ticks = 0
+    for seed, obstacles in jobs:
+        engine, policy = _player(policy_name, width, height, obstacles)
+        result = play_game(engine, policy, speed, seed, max_ticks)
+        result.update(seed=seed, obstacles=obstacles)
+        ticks += result['ticks']
+        games.append(result)
+    return {'worker': os.getpid(), 'games': games, 'ticks': ticks, 'elapsed': time.perf_counter() - start}
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(int(q * len(sorted_values)), len(sorted_values) - 1)]
+
+
+def _describe(values, bin_width=None):
+    values = sorted(values)
+    summary = {
+        'count': len(values),
+        'mean': sum(values) / len(values) if values else None,
+        'min': values[0] if values else None,
+        'p50': _percentile(values, 0.5),
+        'p90': _percentile(values, 0.9),
+        'p99': _percentile(values, 0.99),
+        'max': values[-1] if values else None,
+    }
+    if bin_width:
+        histogram = defaultdict(int)
+        for v in values:
+            histogram[v // bin_width * bin_width] += 1
+        summary['histogram'] = {str(k): histogram[k] for k in sorted(histogram)}
+    return summary
+
+
+class TournamentStats:
+    """ 边收边汇总：按障碍物数分组统计分数和对局长度，并记录每个工作进程的吞吐量 """
+
+    def __init__(self, score_bin=10):
+        self.score_bin = score_bin
+        self.scores = defaultdict(list)
+        self.lengths = defaultdict(list)
+        self.results = defaultdict(lambda: defaultdict(int))
+        self.workers = defaultdict(lambda: [0, 0.0, 0])  # pid -> [逻辑帧, 耗时, 对局数]
+        self.games = 0
+        self.ticks = 0
+
+    def add(self, chunk):
+        stats = self.workers[chunk['worker']]
+        stats[0] += chunk['ticks']
+        stats[1] += chunk['elapsed']
+        stats[2] += len(chunk['games'])
+        self.ticks += chunk['ticks']
+        for game in chunk['games']:
+            key = game['obstacles']
+            self.scores[key].append(game['score'])
+            self.lengths[key].append(game['ticks'])
+            self.results[key][game['result']] += 1
+        self.games += len(chunk['games'])
+
+    def summary(self, wall_time):
+        groups = []
+        for key in sorted(self.scores):
+            groups.append({
+                'obstacles': key,
+                'results': dict(self.results[key]),
+                'score': _describe(self.scores[key], self.score_bin),
+                'ticks': _describe(self.lengths[key]),
+            })
+        workers = {
+            str(pid): {'games': games, 'ticks': ticks, 'ticks_per_sec': ticks / elapsed if elapsed else None}
+            for pid, (ticks, elapsed, games) in sorted(self.workers.items())
+        }
+        return {
+            'games': self.games,
+            'ticks': self.ticks,
+            'wall_time': wall_time,
+            'ticks_per_sec': self.ticks / wall_time if wall_time else None,
+            'workers': workers,
+            'groups': groups,
+        }
+
+
+def make_tasks(args):
+    # 同一组种子用于所有障碍物设置
+    rng = random.Random(args.seed)
+    seeds = [rng.getrandbits(63) for _ in range(args.games)]
+    jobs = [(seed, obstacles) for obstacles in args.obstacles for seed in seeds]
+    size = args.chunk_size
+    return [(args.policy, args.width, args.height, args.speed, args.max_ticks, jobs[i:i + size])
+            for i in range(0, len(jobs), size)]
+
+
+def run(args, out=sys.stdout):
+    """ 运行锦标赛，把每块结果和最终汇总以 JSON 行写入 args.output，返回汇总 """
+    tasks = make_tasks(args)
+    total = sum(len(task[-1]) for task in tasks)
+    stats = TournamentStats()
+    start = time.perf_counter()
+    with open(args.output, 'w') as f, multiprocessing.Pool(args.workers) as pool:
+        for chunk in pool.imap_unordered(run_chunk, tasks):
+            stats.add(chunk)
+            elapsed = time.perf_counter() - start
+            f.write(json.dumps({
+                'type': 'chunk',
+                'worker': chunk['worker'],
+                'completed': stats.games,
+                'total': total,
+                'ticks_per_sec': chunk['ticks'] / chunk['elapsed'] if chunk['elapsed'] else None,
+                'games': chunk['games'],
+            }) + '\n')
+            f.flush()
+            print(f'\r{stats.games}/{total} 局，{stats.ticks / elapsed:,.0f} 帧/秒', end='', file=out, flush=True)
+        summary = dict(stats.summary(time.perf_counter() - start), speed=args.speed)
+        f.write(json.dumps(dict(summary, type='summary')) + '\n')
+    print(file=out)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='贪吃蛇多进程锦标赛')
+    parser.add_argument('--policy', choices=sorted(POLICIES), default='autopilot')
+    parser.add_argument('--games', type=int, default=100, help='每组设置的对局数（种子数）')
+    parser.add_argument('--speed', type=int, choices=range(MIN_SPEED, MAX_SPEED + 1), default=DEFAULT_SPEED,
+                        metavar='SPEED', help=f'开局速度（{MIN_SPEED}..{MAX_SPEED}），只记录在结果里，不影响无界面对局')
+    parser.add_argument('--obstacles', type=int, nargs='+', default=[0, OBSTACLE_COUNT, OBSTACLE_COUNT * 4],
+                        help='要扫描的障碍物数量')
+    parser.add_argument('--width', type=int, default=GRID_WIDTH)
+    parser.add_argument('--height', type=int, default=GRID_HEIGHT)
+    parser.add_argument('--max-ticks', type=int, default=20000, help='单局逻辑帧上限')
+    parser.add_argument('--seed', type=int, default=0, help='生成对局种子用的种子')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--chunk-size', type=int, default=8, help='每次分给工作进程的对局数')
+    parser.add_argument('--output', default='tournament.jsonl')
+    args = parser.parse_args(argv)
+
+    summary = run(args)
+    for group in summary['groups']:
+        score = group['score']
+        print(f"障碍物 {group['obstacles']:2d}: "
+              f"平均 {score['mean']:.1f} 中位 {score['p50']} 最高 {score['max']}，"
+              f"平均 {group['ticks']['mean']:.0f} 帧")
+    print(f"共 {summary['games']} 局，{summary['ticks_per_sec']:,.0f} 帧/秒，结果写入 {args.output}")
+
+
+if __name__ == '__main__':
+    main()